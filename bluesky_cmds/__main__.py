@@ -24,9 +24,18 @@ def main(ctx):
 
 @main.command()
 @click.option("-c", "--config", "config_filepath")
-def launch(config_filepath):
-    from ._main_window import app, MainWindow
-    from .project import style
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    help="Report the time taken by each import and initialization stage of startup.",
+)
+def launch(config_filepath, profile_startup=False):
+    from ._startup import StartupProfile
+
+    profile = StartupProfile(profile_startup)
+    with profile.measure("bluesky_cmds._main_window"):
+        from ._main_window import app, MainWindow
+        from .project import style
 
     if config_filepath:
         config_filepath = pathlib.Path(config_filepath)
@@ -37,10 +46,12 @@ def launch(config_filepath):
 
     global config
     config = toml.load(config_filepath)
-    window = MainWindow(config)
-    style.set_style()
-    window.show()
-    window.showMaximized()
+    with profile.measure("main window"):
+        window = MainWindow(config, profile)
+        style.set_style()
+        window.show()
+        window.showMaximized()
+    window.initialize()
     app.exec_()
     window._shutdown()
 
@@ -0,0 +1,101 @@
+"""Parsing of RE Manager console output into log records."""
+
+__all__ = ["parse_line", "ConsoleParser", "benchmark"]
+
+import logging
+import re
+import time
+
+
+levels = {
+    "D": logging.DEBUG,
+    "I": logging.INFO,
+    "W": logging.WARNING,
+    "E": logging.ERROR,
+    "C": logging.CRITICAL,
+}
+
+
+def parse_line(line):
+    """
+    Split a console line ``[L date time logger.name] message``.
+
+    The header is found by a few bounded string scans for the closing bracket
+    and spaces, so brackets within the message are left alone.
+
+    Returns
+    -------
+    tuple
+        (level number, logger name, message). Lines without a header are
+        returned whole, at INFO level with logger name None.
+    """
+    if line[:1] == "[" and line[2:3] == " ":
+        end = line.find("]", 3)
+        if end > 0 and line.count(" ", 3, end) >= 2:
+            name = line[line.rfind(" ", 3, end) + 1 : end]
+            return levels.get(line[1], logging.INFO), name, line[end + 1 :]
+    return logging.INFO, None, line
+
+
+def _parse_line_regex(line, pattern=re.compile(r"^\[(.) .* .* (.*)\](.*)$")):
+    # the previous parser, for comparison
+    match = pattern.match(line)
+    if match:
+        level, name, msg = match.groups()
+        return levels.get(level, logging.INFO), name, msg
+    return logging.INFO, None, line
+
+
+class ConsoleParser:
+    """
+    Log console lines through children of `root_logger`.
+
+    Children are named by the last part of the logger name in each line, and
+    are looked up once per name rather than once per line.
+    """
+
+    def __init__(self, root_logger):
+        self.root_logger = root_logger
+        self._children = {}
+
+    def child(self, name):
+        try:
+            return self._children[name]
+        except KeyError:
+            logger = self._children[name] = self.root_logger.getChild(name.rpartition(".")[2])
+            return logger
+
+    def handle(self, line):
+        levelno, name, msg = parse_line(line)
+        msg = msg.strip()
+        if msg:
+            logger = self.root_logger if name is None else self.child(name)
+            logger.log(levelno, msg)
+
+
+def benchmark(nlines=100000):
+    """
+    Print the number of console lines per second parsed by `parse_line` and by a regex.
+
+    Typical lines are timed, and lines such as the first line of a printed
+    array, which open a bracket but never close it. The regex backtracks
+    over every combination of spaces in those, so fewer are timed.
+    """
+    typical = [
+        f"[{'DIWEC'[i % 5]} 2022-05-16 10:00:{i % 60:02d},{i % 1000:03d} "
+        f"bluesky_queueserver.manager.worker] Processing item {i}: [{i}, {i + 1}]"
+        for i in range(nlines)
+    ]
+    typical[::10] = ["free text output without a header"] * len(typical[::10])
+    unclosed = ["[" + " ".join(str(i % 10) for i in range(300))] * 20
+    for corpus, lines in (("typical", typical), ("unclosed", unclosed)):
+        for label, parse in (("parse_line", parse_line), ("regex", _parse_line_regex)):
+            start = time.perf_counter()
+            for line in lines:
+                parse(line)
+            elapsed = time.perf_counter() - start
+            print(f"{corpus:>8} {label:>10}: {len(lines) / elapsed:12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,297 @@
+"""Columnar storage of bluesky event documents for live plotting."""
+
+__all__ = ["RingBuffer", "GridImage", "EventStore"]
+
+import tempfile
+
+import numpy as np
+
+import WrightTools.units as wt_units
+
+
+# dtypes used for the json-schema style dtype strings of descriptor data_keys
+_dtypes = {
+    "number": np.float64,
+    "integer": np.float64,  # float so that missing rows can hold NaN
+    "boolean": np.float64,
+    "array": np.float64,
+}
+
+
+class RingBuffer:
+    """
+    Preallocated NumPy array addressed by absolute (ever increasing) row index.
+
+    Rows are stored at ``index % capacity``, so a range of rows which does not
+    cross the end of the array can be returned as a view without copying.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of rows to allocate.
+    shape : tuple (optional)
+        Shape of each row. Default is scalar rows.
+    dtype : numpy dtype (optional)
+        Default is float64, with empty rows holding NaN.
+    growable : bool (optional)
+        If True, the array doubles in size instead of wrapping around.
+        Default is False.
+    """
+
+    def __init__(self, capacity, shape=(), dtype=np.float64, growable=False):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.growable = growable
+        self.data = self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        fill = np.nan if self.dtype.kind == "f" else None
+        return np.full((capacity,) + self.shape, fill, dtype=self.dtype)
+
+    @property
+    def capacity(self):
+        return self.data.shape[0]
+
+    def put(self, index, value):
+        if self.growable:
+            while index >= self.capacity:
+                data = self._allocate(2 * self.capacity)
+                data[: self.capacity] = self.data
+                self.data = data
+        self.data[index % self.capacity] = value
+
+    def put_range(self, start, values):
+        """Write consecutive rows beginning at `start`."""
+        stop = start + len(values)
+        if self.growable:
+            self.put(stop - 1, values[-1])
+        if stop - start > self.capacity:
+            values = values[-self.capacity :]
+            start = stop - self.capacity
+        i = start % self.capacity
+        n = min(len(values), self.capacity - i)
+        self.data[i : i + n] = values[:n]
+        self.data[: len(values) - n] = values[n:]
+
+    def view(self, start, stop):
+        """Rows ``[start, stop)``, a view unless the range wraps around the array end."""
+        i = start % self.capacity
+        j = i + stop - start
+        if j <= self.capacity:
+            return self.data[i:j]
+        return np.concatenate((self.data[i:], self.data[: j - self.capacity]))
+
+    def as_objects(self):
+        """New RingBuffer holding each row of this one as a single object."""
+        out = RingBuffer(self.capacity, (), object, self.growable)
+        for i, row in enumerate(self.data):
+            out.data[i] = row.copy() if self.shape else row
+        return out
+
+
+class GridImage:
+    """
+    Array with the full shape of a grid scan, filled as events arrive.
+
+    Positions which were never written read as NaN.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the scan, as given in the start document.
+    max_bytes : int (optional)
+        Arrays larger than this are backed by a temporary memory-mapped file
+        instead of RAM. The file is not filled up front, a mask records which
+        positions were written instead. Default is 256 MB.
+    """
+
+    def __init__(self, shape, max_bytes=256 * 2**20):
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+        if self.size * 8 <= max_bytes:
+            self._file = None
+            self._written = None
+            self.data = np.full(self.shape, np.nan)
+        else:
+            self._file = tempfile.TemporaryFile(prefix="bluesky-cmds-", suffix=".grid")
+            self.data = np.memmap(self._file, dtype=np.float64, mode="w+", shape=self.shape)
+            self._written = np.zeros(self.shape, dtype=bool)
+
+    def put(self, index, value):
+        """Store `value` at the position of row ``index`` (``seq_num - 1``) of the scan."""
+        if not 0 <= index < self.size:
+            return
+        position = np.unravel_index(index, self.shape)
+        try:
+            self.data[position] = value
+        except (TypeError, ValueError):
+            # not a number, leave the position empty
+            return
+        if self._written is not None:
+            self._written[position] = True
+
+    def put_range(self, start, values):
+        """Store consecutive rows of numbers beginning at `start`."""
+        index = np.arange(start, start + len(values))
+        keep = (0 <= index) & (index < self.size)
+        position = np.unravel_index(index[keep], self.shape)
+        self.data[position] = np.asarray(values)[keep]
+        if self._written is not None:
+            self._written[position] = True
+
+    def plane(self, index):
+        """Last two dimensions, at the position of row `index` in the others."""
+        index = min(max(index, 0), self.size - 1)
+        position = np.unravel_index(index, self.shape)[:-2]
+        if self._written is None:
+            return self.data[position]
+        return np.where(self._written[position], self.data[position], np.nan)
+
+
+class EventStore:
+    """
+    Fixed-schema columnar store of the event documents of a single stream.
+
+    One `RingBuffer` is allocated per data key of the descriptor (plus
+    ``time`` and ``seq_num``), using the dtype and shape declared there.
+    Row ``seq_num - 1`` of every column holds the corresponding event.
+    One dimensional array keys are also reduced to their maximum as they are
+    appended, held in a ``max(key)`` column.
+
+    Parameters
+    ----------
+    data_keys : dict
+        The ``data_keys`` of the descriptor document.
+    capacity : int (optional)
+        Number of events to retain. If None (default) all events are kept.
+    array_capacity : int (optional)
+        Number of events to retain for array valued keys, if smaller than
+        `capacity`. Default is None.
+    """
+
+    def __init__(self, data_keys, capacity=None, array_capacity=None):
+        self.capacity = capacity
+        self.array_capacity = array_capacity
+        self.start = 0
+        self.stop = 0
+        self.columns = {}
+        self.units = {key: data_key.get("units") for key, data_key in data_keys.items()}
+        self.grids = {}
+        self._converted = {}
+        self._add_column("time")
+        self._add_column("seq_num")
+        self.reduced = []
+        for key, data_key in data_keys.items():
+            dtype = _dtypes.get(data_key.get("dtype"), object)
+            shape = data_key.get("shape") or ()
+            if any(not isinstance(n, int) for n in shape):
+                # variable length arrays can't be preallocated
+                dtype, shape = object, ()
+            self._add_column(key, shape, dtype)
+            if len(shape) == 1:
+                self.reduced.append(key)
+                self._add_column(f"max({key})")
+
+    def _add_column(self, key, shape=(), dtype=np.float64):
+        self.columns[key] = self._new_column(shape, dtype)
+
+    def _new_column(self, shape=(), dtype=np.float64):
+        capacity = self.capacity
+        if shape and self.array_capacity is not None:
+            capacity = min(capacity or self.array_capacity, self.array_capacity)
+        if capacity is None:
+            return RingBuffer(1024, shape, dtype, growable=True)
+        return RingBuffer(capacity, shape, dtype)
+
+    def _clip(self, column, start, stop):
+        first = self.start
+        if not column.growable:
+            first = max(first, self.stop - column.capacity)
+        start = first if start is None else max(start, first)
+        stop = self.stop if stop is None else min(stop, self.stop)
+        return start, max(start, stop)
+
+    def grid(self, key, shape, max_bytes=256 * 2**20):
+        """
+        `GridImage` of scalar `key` over the full scan `shape`, collected from now on.
+
+        A new grid starts with the rows still held in the column of `key`.
+        Grids of other keys are released, so `max_bytes` bounds the memory
+        used for grids in total. Returns None if `key` is not scalar.
+        """
+        if key not in self.grids:
+            column = self.columns[key]
+            if column.shape or column.dtype.kind != "f":
+                return None
+            self.grids = {key: GridImage(shape, max_bytes)}
+            start, stop = self._clip(column, None, None)
+            self.grids[key].put_range(start, column.view(start, stop))
+        return self.grids[key]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def append(self, doc):
+        index = doc["seq_num"] - 1
+        self._put("time", index, doc["time"])
+        self._put("seq_num", index, doc["seq_num"])
+        for key, value in doc["data"].items():
+            if key in self.columns:
+                self._put(key, index, value)
+        for key in self.reduced:
+            self._put(f"max({key})", index, np.max(doc["data"].get(key, np.nan)))
+        for key, grid in self.grids.items():
+            grid.put(index, doc["data"].get(key, np.nan))
+        self.stop = max(self.stop, index + 1)
+        if self.capacity is not None:
+            self.start = max(self.start, self.stop - self.capacity)
+
+    def _put(self, key, index, value):
+        column = self.columns[key]
+        try:
+            column.put(index, value)
+        except (TypeError, ValueError):
+            # value does not match the dtype or shape the descriptor promised,
+            # keep every value of the key as it is
+            column = self.columns[key] = column.as_objects()
+            column.put(index, value)
+
+    def view(self, key, start=None, stop=None):
+        """
+        Values of `key` for rows ``[start, stop)``.
+
+        The range is clipped to the rows currently held for `key`. The returned
+        array is a view into the store whenever possible, do not modify it.
+        """
+        column = self.columns[key]
+        return column.view(*self._clip(column, start, stop))
+
+    def converted(self, key, units, start=None, stop=None):
+        """
+        Like `view`, but with values converted from the native units of `key` to `units`.
+
+        Converted values are cached, so each row is only ever converted once
+        (in a single vectorized call for all rows which arrived since the last
+        request). Use `clear_converted` to release the cache.
+        """
+        native = self.units.get(key)
+        if units == native:
+            return self.view(key, start, stop)
+        column, done = self._converted.get((key, units), (None, self.start))
+        if column is None:
+            column = self._new_column(self.columns[key].shape)
+        done = self._clip(column, done, None)[0]
+        if done < self.stop:
+            column.put_range(done, wt_units.convert(self.view(key, done), native, units))
+        self._converted[(key, units)] = (column, self.stop)
+        return column.view(*self._clip(column, start, stop))
+
+    def clear_converted(self):
+        self._converted = {}
+
+    def last(self, key):
+        """Value of `key` in the most recent event."""
+        return self.columns[key].view(self.stop - 1, self.stop)[0]
@@ -0,0 +1,219 @@
+"""Rotating on-disk archive of log records, indexed by time for searching."""
+
+__all__ = ["LogArchive", "search"]
+
+import bisect
+import datetime
+import json
+import logging
+import pathlib
+
+
+# records are written in the order they reach the listener, which may differ
+# slightly from the order of their creation times
+_disorder = 1.0
+
+
+class LogArchive(logging.Handler):
+    """
+    Append-only archive of log records as JSON lines, in rotating segment files.
+
+    Each segment ``<start time>.jsonl`` has an index ``<start time>.idx`` of
+    ``time offset`` lines, one at least every `index_interval` seconds, so that
+    a range of time can be read without scanning the whole archive.
+
+    Records are buffered by `emit` and written by `flush` in a single write,
+    or whenever `batch_size` records have been buffered. Attach the archive to
+    the logging listener, so that neither happens on the GUI thread. Records
+    which can not be written are reported through `handleError` and dropped.
+
+    Parameters
+    ----------
+    directory : path-like
+        Directory holding the segments, created if needed.
+    max_bytes : int (optional)
+        Size after which a new segment is started. Default is 16 MB.
+    backup_count : int (optional)
+        Number of segments to keep, the oldest are deleted. Default is 10.
+    index_interval : float (optional)
+        Seconds between index entries. Default is 60.
+    batch_size : int (optional)
+        Number of buffered records after which they are written without
+        waiting for `flush`. Default is 1000.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_bytes=16 * 2**20,
+        backup_count=10,
+        index_interval=60,
+        batch_size=1000,
+    ):
+        super().__init__()
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.index_interval = index_interval
+        self.batch_size = batch_size
+        self._buffer = []  # (record, line)
+        self._file = None
+        self._index = None
+        self._offset = 0
+        self._last_indexed = None
+
+    def emit(self, record):
+        try:
+            line = json.dumps(
+                {
+                    "time": record.created,
+                    "level": record.levelname,
+                    "levelno": record.levelno,
+                    "logger": record.name,
+                    "message": record.getMessage(),
+                }
+            )
+        except Exception:
+            self.handleError(record)
+            return
+        self._buffer.append((record, (line + "\n").encode()))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self._buffer:
+                return
+            buffer, self._buffer = self._buffer, []
+            try:
+                self._write(buffer)
+            except Exception:
+                self.handleError(buffer[0][0])
+                # the next records go to a new segment, rather than after a partial write
+                try:
+                    self._close_segment()
+                except Exception:
+                    self._file = self._index = None
+
+    def _write(self, buffer):
+        if self._file is None or self._offset >= self.max_bytes:
+            self._rotate(buffer[0][0].created)
+        index = []
+        offset = self._offset
+        for record, line in buffer:
+            created = record.created
+            if self._last_indexed is None or created - self._last_indexed >= self.index_interval:
+                index.append(f"{created} {offset}\n")
+                self._last_indexed = created
+            offset += len(line)
+        self._file.write(b"".join(line for _, line in buffer))
+        self._file.flush()
+        self._index.write("".join(index))
+        self._index.flush()
+        self._offset = offset
+
+    def _rotate(self, created):
+        self._close_segment()
+        stem = datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%dT%H-%M-%S.%f")
+        self._file = open(self.directory / f"{stem}.jsonl", "ab")
+        self._index = open(self.directory / f"{stem}.idx", "a")
+        self._offset = self._file.tell()
+        self._last_indexed = None
+        for path in sorted(self.directory.glob("*.jsonl"))[: -self.backup_count]:
+            path.unlink()
+            try:
+                path.with_suffix(".idx").unlink()
+            except FileNotFoundError:
+                pass
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+        self._file = self._index = None
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self._close_segment()
+        super().close()
+
+
+def _read_index(path):
+    index = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    created, offset = line.split()
+                    index.append((float(created), int(offset)))
+                except ValueError:
+                    # partially written line
+                    pass
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def search(directory, start=None, stop=None, level=logging.NOTSET, logger=None):
+    """
+    Archived records created in ``[start, stop)``, oldest first.
+
+    Only segments overlapping the range are opened, and each is read from the
+    last index entry before `start`.
+
+    Parameters
+    ----------
+    directory : path-like
+        Directory of a `LogArchive`.
+    start, stop : float (optional)
+        Range of record creation times, as POSIX timestamps. Default is unbounded.
+    level : int (optional)
+        Minimum level of records. Default is all levels.
+    logger : str (optional)
+        Only records of this logger and its children. Default is all loggers.
+
+    Yields
+    ------
+    dict
+        Records with keys ``time``, ``level``, ``levelno``, ``logger`` and ``message``.
+    """
+    segments = [
+        (path, _read_index(path.with_suffix(".idx")))
+        for path in sorted(pathlib.Path(directory).glob("*.jsonl"))
+    ]
+    segments = [(path, index) for path, index in segments if index]
+    for i, (path, index) in enumerate(segments):
+        if stop is not None and index[0][0] >= stop + _disorder:
+            break
+        if start is not None and i + 1 < len(segments):
+            if segments[i + 1][1][0][0] <= start - _disorder:
+                continue
+        offset = 0
+        if start is not None:
+            k = bisect.bisect_right([created for created, _ in index], start - _disorder) - 1
+            if k >= 0:
+                offset = index[k][1]
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # partially written line
+                    continue
+                created = record["time"]
+                if start is not None and created < start:
+                    continue
+                if stop is not None and created >= stop:
+                    if created >= stop + _disorder:
+                        break
+                    continue
+                if record["levelno"] < level:
+                    continue
+                if logger and not (
+                    record["logger"] == logger or record["logger"].startswith(logger + ".")
+                ):
+                    continue
+                yield record
@@ -4,8 +4,11 @@
 from qtpy import QtWidgets, QtCore
 
 
+import functools
 import pathlib
 
+import appdirs  # type: ignore
+
 
 #### import ###################################################################
 # BEWARE OF CHANGING ORDER OF IMPORTS!!!!!!!!!
@@ -14,7 +17,8 @@ from ._app import app
 from .project import project_globals as g
 from .project.colors import colors
 from .project import widgets as pw
-from .logging import getLogger, log_widget
+from .logging import getLogger, log_widget, start_archive
+from ._startup import StartupProfile, ImportThread, heavy_modules
 
 
 ### version information #######################################################
@@ -29,9 +33,10 @@ window = None
 class MainWindow(QtWidgets.QMainWindow):
     shutdown = QtCore.Signal()
 
-    def __init__(self, config):
+    def __init__(self, config, profile=None):
         QtWidgets.QMainWindow.__init__(self, parent=None)
         self.config = config
+        self.profile = profile or StartupProfile()
         g.shutdown.write(self.shutdown)
         global window
         window = self
@@ -43,16 +48,53 @@ class MainWindow(QtWidgets.QMainWindow):
         # self._center()
         self.resize(self.window_horiz_size, self.window_verti_size)
         self._create_main_frame()
-        # initialize program
-        self._initialize_widgets()
         # populate self
         self.data_folder = pathlib.Path.home() / "bluesky-cmds-data"
         self.data_folder.mkdir(exist_ok=True)
-        # somatic system
-        from bluesky_cmds.somatic import queue, signals
+        self.queue_message.setText("starting")
+        self.queue_gui = None
 
-        self.queue_gui = queue.GUI(self.queue_widget, self.queue_message)
+    def initialize(self):
+        """
+        Import and start everything else, once the window is shown.
+
+        Slow third party imports run in a background thread. The stages which
+        create widgets or connect to the servers then run one at a time on the
+        GUI thread, so that the window keeps painting between them. Progress
+        is shown in the queue message label.
+        """
+        self._stages = [
+            ("plot", self._initialize_widgets),
+            ("queue", self._initialize_queue),
+            ("logs", self._initialize_logs),
+        ]
+        self._import_thread = ImportThread(heavy_modules, self.profile)
+        self._import_thread.progress.connect(
+            lambda name: self.queue_message.setText(f"importing {name}")
+        )
+        self._import_thread.finished.connect(self._next_stage)
+        self._import_thread.start()
+
+    def _next_stage(self):
+        if not self._stages:
+            self._initialized()
+            return
+        name, method = self._stages.pop(0)
+        self.queue_message.setText(f"loading {name}")
+        # return to the event loop so that the label is painted before the stage runs
+        QtCore.QTimer.singleShot(0, functools.partial(self._run_stage, name, method))
+
+    def _run_stage(self, name, method):
+        with self.profile.measure(name):
+            method()
+        self._next_stage()
+
+    def _initialized(self):
+        from bluesky_cmds.somatic import signals
+
+        self.queue_message.setText(signals.status.get("manager_state") or "connecting")
         signals.manager_state_updated.connect(self.queue_message.setText)
+        self.profile.report()
 
     def _create_main_frame(self):
         self.main_frame = QtWidgets.QWidget(parent=self)
@@ -106,6 +148,29 @@ class MainWindow(QtWidgets.QMainWindow):
         # import widgets
         import bluesky_cmds._plot
 
+    def _initialize_queue(self):
+        # somatic system
+        from bluesky_cmds.somatic import queue, signals
+
+        self.queue_gui = queue.GUI(self.queue_widget, self.queue_message)
+        # only now is every slot connected to receive the first full status
+        signals.start_monitor()
+
+    def _initialize_logs(self):
+        from bluesky_cmds.somatic import comms
+
+        log_config = self.config.get("logging", {})
+        if log_config.get("archive", True):
+            directory = log_config.get("archive-directory") or appdirs.user_log_dir(
+                "bluesky-cmds", "bluesky-cmds"
+            )
+            start_archive(
+                directory,
+                max_bytes=int(log_config.get("archive-segment-mb", 16) * 2**20),
+                backup_count=log_config.get("archive-segments", 10),
+            )
+        comms.start_log_thread()
+
     def _shutdown(self):
         """
         attempt a clean shutdown
@@ -2,6 +2,9 @@
 
 from collections import deque
 import itertools
+import queue
+import threading
+import time
 
 from qtpy import QtCore, QtWidgets
 import numpy as np
@@ -18,6 +21,7 @@ import bluesky_cmds.project.classes as pc
 import bluesky_cmds.somatic as somatic
 from bluesky_cmds.__main__ import config
 from bluesky_cmds._main_window import window
+from bluesky_cmds._event_store import EventStore
 
 from .logging import getLogger
 
@@ -27,10 +31,14 @@ logger = getLogger("plot")
 class GUI(QtCore.QObject):
     def __init__(self):
         QtCore.QObject.__init__(self)
+        self.lod_threshold = config.get("plot", {}).get("lod-threshold", 2000)
         self.create_frame()
         self.create_settings()
-        self.data = None
         self._units_map = {}
+        self._slices = deque()
+        self._spectra = []
+        self._waterfall = None
+        self._image = None
 
     def create_frame(self):
         self.main_widget = window.plot_widget
@@ -86,6 +94,16 @@ class GUI(QtCore.QObject):
         input_table.add("X-Axis", self.axis)
         self.axis_units = pc.Combo()
         input_table.add("X-Units", self.axis_units)
+        self.downsample = pc.Bool(initial_value=True)
+        self.downsample.set_tool_tip(
+            f"Draw slices of more than {self.lod_threshold} points as a min/max envelope without symbols"
+        )
+        input_table.add("Downsample", self.downsample)
+        self.spectra_mode = pc.Combo(["waterfall", "lines"])
+        input_table.add("Spectra", self.spectra_mode)
+        self.grid_mode = pc.Combo(["slices", "image"])
+        self.grid_mode.set_tool_tip("Show multidimensional scans as an image of the current plane")
+        input_table.add("Grid", self.grid_mode)
         self.settings_layout.addWidget(input_table)
         # global daq settings
         input_table = pw.InputTable()
@@ -94,6 +112,8 @@ class GUI(QtCore.QObject):
         # input_table.add("Loop Time", loop_time)
         self.idx_string = pc.String(initial_value="None", display=True)
         input_table.add("Scan Index", self.idx_string)
+        self.skipped_redraws = pc.String(initial_value="0", display=True)
+        input_table.add("Skipped Redraws", self.skipped_redraws)
         self.settings_layout.addWidget(input_table)
         # stretch
         self.settings_layout.addStretch(1)
@@ -102,96 +122,611 @@ class GUI(QtCore.QObject):
         self._units_map = units_map
         self.on_axis_updated()
 
+    def settings(self):
+        """What the plot worker prepares frames for."""
+        return (
+            self.channel.read(),
+            self.axis.read(),
+            self.axis_units.read(),
+            self.spectra_mode.read(),
+            self.grid_mode.read(),
+            self.downsample.read(),
+        )
+
+    def update_plot(self):
+        # the worker answers with a full frame
+        plot_worker.set_settings(self.settings())
+
     def on_axis_updated(self):
         units = self._units_map.get(self.axis.read())
         units = [units] + list(wt.units.get_valid_conversions(units))
         self.axis_units.set_allowed_values(units)
 
-    def update_plot(self):
-        # data
-        if not plot_callback.events:
+    def on_frame(self):
+        if plot_worker.settings != self.settings():
+            # a combo was changed without emitting updated
+            self.update_plot()
+        # drop the pending flag first, so that no frame published from now on is missed
+        frame = plot_worker.take_frame()
+        self.skipped_redraws.write(str(plot_worker.coalesced))
+        if frame is None:
             return
-        x_units = self.axis_units.read()
-        axis = self.axis.read()
-        channel = self.channel.read()
-        self.plot_widget.clear()
-
-        def plot_0d(start, stop, color="c"):
-            stop = min(stop, len(plot_callback.events))
-            if axis == "time":
-                x = [plot_callback.events[i]["time"] for i in range(start, stop)]
+        if frame.seq_num is not None:
+            if plot_callback.expected_events > 0:
+                g.progress_bar.set_fraction(frame.seq_num / plot_callback.expected_events)
+            self.idx_string.write(frame.index)
+        self.draw(frame)
+
+    def draw(self, frame):
+        """Draw the buffers of `frame`, prepared by the plot worker."""
+        if frame.full:
+            # channel, axis or units changed (or a new run started), start over
+            self.plot_widget.clear()
+            self._slices = deque()
+            self._spectra = []
+            self._waterfall = None
+            self._image = None
+        if frame.kind == "image":
+            self._draw_image(frame)
+        elif frame.kind == "slices":
+            self._draw_slices(frame)
+        elif frame.kind == "waterfall":
+            self._draw_waterfall(frame)
+        elif frame.kind == "spectra":
+            self._draw_spectra(frame)
+        if frame.big is not None:
+            channel, num = frame.big
+            self.big_channel.setText(channel)
+            self.big_display.setValue(num)
+
+    def _draw_slices(self, frame):
+        """Redraw only the slices which received events since the last frame."""
+        current = self._slices[-1].index if self._slices else -1
+        recolor = False
+        for index in sorted(frame.slices):
+            x, y = frame.slices[index]
+            if index > current:
+                plot_slice = self._new_slice(index)
+                current = index
+                recolor = True
             else:
-                x = [plot_callback.events[i]["data"][axis] for i in range(start, stop)]
-            y = [plot_callback.events[i]["data"][channel] for i in range(start, stop)]
-            try:
-                xi = wt.units.convert(
-                    x,
-                    self._units_map.get(axis),
-                    x_units,
-                )
-                self.plot_widget.plot_object.plot(
-                    # self.plot_scatter.addPoints(
-                    xi,
-                    y,
-                    size=5,
-                    pen=pg.mkPen(color),
-                    brush=pg.mkBrush(color),
-                    symbol="o",
-                    symbolPen=pg.mkPen(color),
-                    symbolBrush=pg.mkBrush(color),
-                )
-            except (TypeError, ValueError) as e:
-                logger.error(e)
-
-        def plot_1d(event, color="c"):
-            x = event["data"][axis]
-            y = event["data"][channel]
-            try:
-                xi = wt.units.convert(
-                    x,
-                    self._units_map.get(axis),
-                    x_units,
-                )
-                self.plot_widget.plot_object.plot(
-                    # self.plot_scatter.addPoints(
-                    xi,
-                    y,
-                    pen=pg.mkPen(color),
-                    brush=pg.mkBrush(color),
-                )
-            except (TypeError, ValueError) as e:
-                logger.error(e)
-
-        num = plot_callback.events[-1]["data"][channel]
-        if np.isscalar(num):
-            start = 0
-            cidx = 0
-            ncolors = int(np.ceil(len(plot_callback.events) / plot_callback.slice_size))
-            colors = np.linspace([60, 60, 60], [0, 255, 255], ncolors, dtype="u1")
-            if ncolors == 1:
-                colors = ["c"]
-
-            idx = plot_callback.events[-1].get("seq_num", len(plot_callback.events))
-            if len(plot_callback.events) == plot_callback.events.maxlen:
-                start = plot_callback.slice_size - idx % plot_callback.slice_size
-                plot_0d(0, start, [60, 60, 60])
-            while start < len(plot_callback.events):
-                plot_0d(start, start + plot_callback.slice_size, colors[cidx])
-                start += plot_callback.slice_size
-                cidx += 1
-        elif np.array(num).ndim == 1:
-            ncolors = min(len(plot_callback.events), 5)
+                plot_slice = next((s for s in self._slices if s.index == index), None)
+                if plot_slice is None:
+                    # older than the retained slices
+                    continue
+            plot_slice.set_lod(self.downsample.read() and len(x) > self.lod_threshold)
+            plot_slice.draw(x, y)
+        if recolor:
+            self._recolor_slices()
+
+    def _new_slice(self, index):
+        if len(self._slices) >= plot_callback.nslices:
+            # recycle the plot item of the oldest slice
+            plot_slice = self._slices.popleft()
+            plot_slice.index = index
+        else:
+            item = self.plot_widget.plot_object.plot([], [], size=5, symbol="o")
+            plot_slice = PlotSlice(index, item)
+        self._slices.append(plot_slice)
+        return plot_slice
+
+    def _recolor_slices(self):
+        if len(self._slices) == 1:
+            colors = ["c"]
+        else:
+            colors = np.linspace([60, 60, 60], [0, 255, 255], len(self._slices), dtype="u1")
+        for plot_slice, color in zip(self._slices, colors):
+            plot_slice.set_color(color)
+
+    def _draw_spectra(self, frame):
+        if len(self._spectra) != len(frame.spectra):
+            for item in self._spectra:
+                self.plot_widget.plot_object.removeItem(item)
+            ncolors = len(frame.spectra)
             colors = np.linspace([60, 60, 60], [0, 160, 160], ncolors, dtype="u1")
             colors[-1] = [0, 255, 255]
-            for e, c in zip(range(-5, 0), colors):
-                plot_1d(plot_callback.events[e], c)
-
-        num = plot_callback.events[-1]["data"][channel]
-        if not np.isscalar(num):
+            self._spectra = [
+                self.plot_widget.plot_object.plot([], [], pen=pg.mkPen(color)) for color in colors
+            ]
+        for item, (x, y) in zip(self._spectra, frame.spectra):
+            item.setData(x, y)
+
+    def _draw_image(self, frame):
+        """Show the plane of the grid scan which holds the most recent point."""
+        if self._image is None:
+            item = pg.ImageItem()
+            self.plot_widget.plot_object.addItem(item)
+            self._image = GridPlaneImage(item)
+        if frame.image is not None:
+            self._image.set_plane(frame.image)
+        for i, j, values in frame.pixels:
+            self._image.set_pixels(i, j, values)
+        self._image.draw(frame.rect)
+
+    def _draw_waterfall(self, frame):
+        """Show every retained spectrum as one row of an image, newest on top."""
+        if self._waterfall is None:
+            item = pg.ImageItem()
+            self.plot_widget.plot_object.addItem(item)
+            self._waterfall = WaterfallImage(item, frame.height)
+        for first, block in frame.rows:
+            self._waterfall.add_rows(first, block)
+        self._waterfall.draw(frame.xrange)
+
+
+class FrameScheduler(QtCore.QObject):
+    """
+    Coalesce redraw requests so that `slot` runs at most `fps` times per second.
+
+    Requests arriving while a redraw is already pending are dropped.
+    """
+
+    def __init__(self, slot, fps=30):
+        QtCore.QObject.__init__(self)
+        self.slot = slot
+        self.interval = 1 / fps
+        self.dirty = False
+        self.last_frame = 0
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def request(self):
+        if self.dirty:
+            return
+        self.dirty = True
+        wait = self.interval - (time.monotonic() - self.last_frame)
+        self.timer.start(max(0, int(wait * 1000)))
+
+    def on_timeout(self):
+        self.dirty = False
+        self.last_frame = time.monotonic()
+        self.slot()
+
+
+class Frame:
+    """
+    Ready to draw copies of what the plot shows, prepared by the `PlotWorker`.
+
+    `kind` is "slices", "spectra", "waterfall", "image" or None (nothing to
+    draw). A `full` frame replaces everything drawn before, otherwise only
+    the slices in `slices` changed, only the waterfall `rows` were added, and
+    only the `pixels` of the image changed (unless a new plane is in `image`).
+    """
+
+    def __init__(self, kind, full):
+        self.kind = kind
+        self.full = full
+        self.slices = {}  # slice index: (x, y)
+        self.spectra = []  # (x, y) of the newest spectra, oldest first
+        self.image = None  # the whole plane, when a new one is shown
+        self.pixels = []  # (rows, columns, values) of points added to the plane
+        self.rect = None  # x, y, width, height of the image
+        self.rows = []  # (first row, 2D array) of spectra for the waterfall
+        self.height = None  # number of spectra the waterfall retains
+        self.xrange = None  # x of the first and last column of the waterfall
+        self.big = None  # channel name, value
+        self.seq_num = None
+        self.index = None
+
+    def merge(self, newer):
+        """Fold a frame prepared after this one, which was not drawn yet, into this one."""
+        self.kind = newer.kind or self.kind
+        self.slices.update(newer.slices)
+        self.rows.extend(newer.rows)
+        self.height = newer.height
+        self.xrange = newer.xrange or self.xrange
+        self.spectra = newer.spectra
+        if newer.image is not None:
+            self.image = newer.image
+            self.pixels = []
+        self.pixels.extend(newer.pixels)
+        self.rect = newer.rect or self.rect
+        self.big = newer.big
+        if newer.seq_num is not None:
+            self.seq_num = newer.seq_num
+            self.index = newer.index
+
+
+class PlotWorker(QtCore.QThread):
+    """
+    Decode event documents into their columnar store, and prepare frames, off the GUI thread.
+
+    Documents are handed over through a bounded queue and processed in batches.
+    The worker alone reads and writes the store. After each batch it copies
+    what the plot shows, converted to the units shown, into a `Frame`, and a
+    redraw is requested with at most one request pending on the Qt event loop
+    at a time. `lock` is only held to exchange the frame and the settings, so
+    the GUI never waits for a batch to be decoded. Frames merged into one
+    which was not yet taken are counted in `coalesced`.
+
+    Documents which can not be stored, and frames which can not be prepared,
+    are logged and skipped. If the inbox is full, further documents are dropped
+    rather than blocking the GUI thread.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=1000, grid_bytes=256 * 2**20):
+        QtCore.QThread.__init__(self)
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.grid_bytes = grid_bytes
+        self.lock = threading.Lock()
+        self.frame = None
+        self.settings = None
+        self.coalesced = 0
+        self._pending = threading.Event()
+        self._store = None
+        self._shape = None
+        self._settings = None
+        self._last_row = 0
+        self._plane = None  # position of the plane the GUI holds
+        self._dropping = False
+
+    def put(self, store, shape, doc):
+        # never block the GUI thread, even if the worker can not keep up
+        try:
+            self.inbox.put_nowait((store, shape, doc))
+        except queue.Full:
+            if not self._dropping:
+                logger.warning("plot worker is behind, dropping events")
+            self._dropping = True
+        else:
+            self._dropping = False
+
+    def set_settings(self, settings):
+        """Prepare frames for `settings` (see `GUI.settings`), starting with a full frame."""
+        with self.lock:
+            self.settings = settings
+        try:
+            # wake the worker, if the inbox is full it is awake anyway
+            self.inbox.put_nowait((None, None, None))
+        except queue.Full:
+            pass
+
+    def take_frame(self):
+        self._pending.clear()
+        with self.lock:
+            frame, self.frame = self.frame, None
+        return frame
+
+    def run(self):
+        while True:
+            batch = [self.inbox.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.inbox.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                return
+            try:
+                self._process(batch)
+            except Exception as e:
+                # a bad document must not stop the worker for the rest of the session
+                logger.error(f"plot worker: {e!r}")
+
+    def _process(self, batch):
+        full = False
+        last = None
+        for store, shape, doc in batch:
+            if store is None:
+                continue
+            if store is not self._store:
+                # a new run
+                self._store, self._shape = store, shape
+                self.coalesced = 0
+                full = True
+            try:
+                store.append(doc)
+            except Exception as e:
+                logger.error(f"skipped event {doc.get('seq_num')}: {e!r}")
+                continue
+            last = doc
+        with self.lock:
+            settings = self.settings
+        if self._store is None:
+            return
+        if settings != self._settings:
+            if self._settings is not None and settings[2] != self._settings[2]:
+                # converted values are only reused until other units are picked
+                self._store.clear_converted()
+            self._settings = settings
+            full = True
+        if not full and last is None:
+            return
+        try:
+            frame = self._prepare(full)
+        except Exception:
+            # try again with a full frame after the next batch
+            self._settings = None
+            raise
+        if last is not None:
+            index = last["seq_num"] - 1
+            if self._shape and index:
+                index = np.unravel_index(index, self._shape)
+            frame.seq_num, frame.index = last["seq_num"], str(index)
+        with self.lock:
+            if self.frame is None:
+                self.frame = frame
+            else:
+                if frame.full:
+                    frame.seq_num = frame.seq_num or self.frame.seq_num
+                    frame.index = frame.index or self.frame.index
+                    self.frame = frame
+                else:
+                    self.frame.merge(frame)
+                self.coalesced += 1
+        if not self._pending.is_set():
+            self._pending.set()
+            somatic.signals.update_plot.emit()
+
+    def _prepare(self, full):
+        store = self._store
+        if self._settings is None:
+            # the GUI sets them when it takes this frame
+            return Frame(None, full)
+        channel, axis, units, spectra_mode, grid_mode, _ = self._settings
+        if full:
+            self._plane = None
+        if not len(store) or channel not in store or axis not in store:
+            return Frame(None, full)
+        num = store.last(channel)
+        grid = None
+        if grid_mode == "image" and self._shape and len(self._shape) > 1 and np.ndim(num) == 0:
+            # allocated only once an image of this channel is asked for
+            grid = store.grid(channel, self._shape, self.grid_bytes)
+        if grid is not None:
+            frame = Frame("image", full)
+            self._prepare_image(frame, grid)
+        elif np.ndim(num) == 0:
+            frame = Frame("slices", full)
+            self._prepare_slices(frame)
+        elif np.ndim(num) == 1 and spectra_mode == "waterfall":
+            frame = Frame("waterfall", full)
+            self._prepare_waterfall(frame)
+        elif np.ndim(num) == 1:
+            frame = Frame("spectra", full)
+            self._prepare_spectra(frame)
+        else:
+            frame = Frame(None, full)
+        self._last_row = store.stop
+        if np.ndim(num) != 0:
             channel = f"max({channel})"
-            num = np.max(num)
-        self.big_channel.setText(channel)
-        self.big_display.setValue(num)
+            # reduced as the event arrived
+            num = store.last(channel) if channel in store else np.max(num)
+        frame.big = (channel, num)
+        return frame
+
+    def _converted(self, start=None, stop=None):
+        _, axis, units, *_ = self._settings
+        try:
+            return self._store.converted(axis, units, start, stop)
+        except (TypeError, ValueError) as e:
+            logger.error(e)
+            return None
+
+    def _prepare_slices(self, frame):
+        store = self._store
+        channel = self._settings[0]
+        slice_size = self._shape[-1] if self._shape else 2**64
+        last = (store.stop - 1) // slice_size
+        if frame.full:
+            first = max(store.start // slice_size, last - plot_callback.nslices + 1)
+        else:
+            first = self._last_row // slice_size
+        for index in range(first, last + 1):
+            start = index * slice_size
+            x = self._converted(start, start + slice_size)
+            if x is None:
+                frame.slices[index] = ([], [])
+                continue
+            y = store.view(channel, start, start + slice_size)
+            frame.slices[index] = (np.array(x), np.array(y))
+
+    def _prepare_spectra(self, frame):
+        store = self._store
+        start = store.stop - min(len(store), 5)
+        xs = self._converted(start)
+        if xs is None:
+            return
+        ys = store.view(self._settings[0], start)
+        frame.spectra = [(np.array(x), np.array(y)) for x, y in zip(xs, ys)]
+
+    def _prepare_waterfall(self, frame):
+        store = self._store
+        channel = self._settings[0]
+        column = store.columns[channel]
+        frame.height = min(column.capacity, store.array_capacity or column.capacity)
+        # only the rows added since the last frame, unless starting over
+        start = store.stop - frame.height
+        if not frame.full:
+            start = max(start, self._last_row)
+        rows = store.view(channel, start)
+        if not len(rows):
+            return
+        block = _stack_rows(rows)
+        frame.rows.append((store.stop - len(rows), block))
+        x = self._converted(store.stop - 1)
+        try:
+            x = np.ravel(np.asarray(x[0], dtype=float))
+        except (TypeError, ValueError, IndexError):
+            x = []
+        if len(x) > 1:
+            frame.xrange = (x[0], x[-1])
+        else:
+            frame.xrange = (0, block.shape[1])
+
+    def _prepare_image(self, frame, grid):
+        store = self._store
+        index = store.stop - 1
+        position = np.unravel_index(index, self._shape)[:-2]
+        plane = grid.plane(index)
+        if position != self._plane:
+            frame.image = np.array(plane)
+            self._plane = position
+        else:
+            # only the points which arrived since the last frame
+            size = plane.size
+            rows = np.arange(max(self._last_row, index - index % size), store.stop)
+            i, j = np.unravel_index(rows % size, plane.shape)
+            frame.pixels.append((i, j, plane[i, j]))
+        # x extent from the current slice, which is one row of the image
+        slice_size = self._shape[-1]
+        x = self._converted((store.stop - 1) // slice_size * slice_size)
+        if x is not None and len(x) > 1 and np.all(np.isfinite(x[[0, -1]])):
+            step = (x[-1] - x[0]) / (len(x) - 1)
+            x0, width = x[0] - step / 2, step * plane.shape[1]
+        else:
+            x0, width = 0, plane.shape[1]
+        frame.rect = (x0, 0, width, plane.shape[0])
+
+    def stop(self):
+        if self.isRunning():
+            self.inbox.put(None)
+            self.wait()
+
+
+def _stack_rows(rows):
+    """2D float array of spectra `rows`, padding rows of differing length with NaN."""
+    if rows.dtype != object and rows.ndim == 2:
+        return np.array(rows, dtype=float)
+    # variable length arrays, held one object per row
+    arrays = []
+    for row in rows:
+        try:
+            arrays.append(np.ravel(np.asarray(row, dtype=float)))
+        except (TypeError, ValueError):
+            arrays.append(np.empty(0))
+    try:
+        return np.stack(arrays)
+    except ValueError:
+        block = np.full((len(arrays), max(len(a) for a in arrays)), np.nan)
+        for i, a in enumerate(arrays):
+            block[i, : len(a)] = a
+        return block
+
+
+class WaterfallImage:
+    """
+    Persistent image of the newest `height` spectra, one per row, updated in place.
+
+    Each row is written twice into a buffer of ``2 * height`` rows, at
+    ``i % height`` and ``i % height + height``, so the newest rows in order are
+    always a contiguous view of the buffer and are never copied. Levels are
+    widened as rows arrive rather than recomputed from the whole image.
+    """
+
+    def __init__(self, item, height):
+        self.item = item
+        self.height = height
+        self.data = None
+        self.first = 0
+        self.stop = 0
+        self.levels = None
+        self.xrange = None
+
+    def add_rows(self, first, block):
+        width = block.shape[1]
+        if not width:
+            return
+        if self.data is None or width > self.data.shape[1]:
+            self.data = np.full((2 * self.height, width), np.nan)
+            self.first = first
+            self.levels = None
+        elif width < self.data.shape[1]:
+            padded = np.full((len(block), self.data.shape[1]), np.nan)
+            padded[:, :width] = block
+            block = padded
+        if len(block) > self.height:
+            first += len(block) - self.height
+            block = block[-self.height :]
+        rows = np.arange(first, first + len(block)) % self.height
+        self.data[rows] = block
+        self.data[rows + self.height] = block
+        self.stop = max(self.stop, first + len(block))
+        self.levels = _widen_levels(self.levels, block)
+
+    def draw(self, xrange=None):
+        self.xrange = xrange or self.xrange
+        if self.levels is None:
+            return
+        start = max(self.first, self.stop - self.height)
+        i = start % self.height
+        self.item.setImage(
+            self.data[i : i + self.stop - start].T, autoLevels=False, levels=self.levels
+        )
+        x0, x1 = self.xrange or (0, self.data.shape[1])
+        self.item.setRect(QtCore.QRectF(x0, start, x1 - x0, self.stop - start))
+
+
+class GridPlaneImage:
+    """
+    Persistent image of the plane of a grid scan being filled, updated in place.
+
+    Only the points which arrived since the last frame are written, and levels
+    are widened as they arrive rather than recomputed from the whole plane.
+    """
+
+    def __init__(self, item):
+        self.item = item
+        self.data = None
+        self.levels = None
+
+    def set_plane(self, image):
+        self.data = image
+        self.levels = _widen_levels(None, image)
+
+    def set_pixels(self, i, j, values):
+        if self.data is None:
+            return
+        self.data[i, j] = values
+        self.levels = _widen_levels(self.levels, values)
+
+    def draw(self, rect=None):
+        if self.levels is None:
+            return
+        self.item.setImage(self.data.T, autoLevels=False, levels=self.levels)
+        if rect is not None:
+            self.item.setRect(QtCore.QRectF(*rect))
+
+
+def _widen_levels(levels, values):
+    """`levels` (low, high), or None, widened to include the finite `values`."""
+    finite = values[np.isfinite(values)]
+    if not finite.size:
+        return levels
+    low, high = finite.min(), finite.max()
+    if levels is not None:
+        low, high = min(low, levels[0]), max(high, levels[1])
+    return (low, high)
+
+
+class PlotSlice:
+    """Persistent plot item holding the points of one slice of the scan."""
+
+    def __init__(self, index, item):
+        self.index = index
+        self.item = item
+        self.lod = False
+
+    def draw(self, x, y):
+        self.item.setData(x, y)
+
+    def set_lod(self, lod):
+        """Toggle min/max envelope downsampling to screen resolution, without symbols."""
+        if lod == self.lod:
+            return
+        self.lod = lod
+        self.item.setDownsampling(ds=1, auto=lod, method="peak")
+        self.item.setClipToView(lod)
+        self.item.setSymbol(None if lod else "o")
+
+    def set_color(self, color):
+        pen = pg.mkPen(color)
+        brush = pg.mkBrush(color)
+        self.item.setPen(pen)
+        self.item.setSymbolPen(pen)
+        self.item.setSymbolBrush(brush)
 
 
 gui = GUI()
@@ -201,16 +736,19 @@ class PlotCallback(CallbackBase):
     def __init__(self):
         self.start_doc = None
         self.stop_doc = None
-        self.events = None
+        self.store = None
+        self.capacity = None
         self.descriptor_doc = None
         self.dimensions = []
         self.units_map = {}
         self.slice_size = 2**64
+        self.nslices = 5
         self.progress_bar = g.progress_bar
 
     def start(self, doc):
         logger.info(doc)
         self.start_doc = doc
+        self.store = None
         super().start(doc)
         self.progress_bar.begin_new_scan_timer()
         self.progress_bar.set_color("go")
@@ -232,10 +770,10 @@ class PlotCallback(CallbackBase):
         if self.start_doc.get("shape"):
             self.shape = self.start_doc["shape"]
             # TODO not hardcode number of slices
-            self.events = deque(maxlen=5 * self.shape[-1])
+            self.capacity = self.nslices * self.shape[-1]
             self.slice_size = self.shape[-1]
         else:
-            self.events = deque()
+            self.capacity = config.get("plot", {}).get("max-points", 100000)
             self.shape = None
             self.slice_size = 2**64
 
@@ -246,6 +784,11 @@ class PlotCallback(CallbackBase):
             return
         self.descriptor_doc = doc
         super().descriptor(doc)
+        self.store = EventStore(
+            doc.get("data_keys", {}),
+            self.capacity,
+            config.get("plot", {}).get("max-spectra", 1000),
+        )
 
         self.dimensions.extend(
             [
@@ -273,19 +816,12 @@ class PlotCallback(CallbackBase):
         if doc["descriptor"] != self.descriptor_doc["uid"]:
             return
         super().event(doc)
-        if self.expected_events > 0:
-            self.progress_bar.set_fraction(doc["seq_num"] / self.expected_events)
-        self.events.append(doc)
-        index = doc["seq_num"] - 1
-        if self.shape and index:
-            index = np.unravel_index(index, self.shape)
-        gui.idx_string.write(str(index))
-
-        somatic.signals.update_plot.emit()
+        plot_worker.put(self.store, self.shape, doc)
 
     def stop(self, doc):
         super().stop(doc)
         logger.info(doc)
+        logger.debug(f"coalesced {plot_worker.coalesced} redraws")
         if doc["exit_status"] != "success":
             self.progress_bar.set_color("stop")
 
@@ -297,10 +833,18 @@ dispatcher.subscribe(plot_callback)
 dispatcher.start()
 g.shutdown.add_method(wait_for_workers_to_quit)
 
+plot_worker = PlotWorker(grid_bytes=config.get("plot", {}).get("grid-memory-mb", 256) * 2**20)
+plot_worker.start()
+g.shutdown.add_method(plot_worker.stop)
+
+frame_scheduler = FrameScheduler(gui.on_frame, config.get("plot", {}).get("fps", 30))
 
-somatic.signals.update_plot.connect(gui.update_plot)
+somatic.signals.update_plot.connect(frame_scheduler.request)
 # somatic.signals.data_file_created.connect(gui.on_data_file_created)
 gui.axis.updated.connect(gui.on_axis_updated)
 gui.axis.updated.connect(gui.update_plot)
 gui.axis_units.updated.connect(gui.update_plot)
 gui.channel.updated.connect(gui.update_plot)
+gui.downsample.updated.connect(gui.update_plot)
+gui.spectra_mode.updated.connect(gui.update_plot)
+gui.grid_mode.updated.connect(gui.update_plot)
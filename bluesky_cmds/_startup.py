@@ -0,0 +1,86 @@
+"""Staged startup of the main window, optionally timing each stage."""
+
+__all__ = ["StartupProfile", "ImportThread"]
+
+import contextlib
+import importlib
+import sys
+import time
+
+from qtpy import QtCore
+
+
+# third party modules which are slow to import, but create no Qt objects when imported
+heavy_modules = [
+    "numpy",
+    "toolz",
+    "WrightTools",
+    "pyqtgraph",
+    "bluesky",
+    "bluesky_widgets.qt.zmq_dispatcher",
+    "bluesky_queueserver_api.zmq",
+    "zmq",
+    "sympy",
+]
+
+
+class StartupProfile:
+    """
+    Wall time taken by each stage of startup.
+
+    Parameters
+    ----------
+    enabled : bool (optional)
+        If False (default), stages are not timed and `report` does nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = []
+        self.t0 = time.perf_counter()
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """Time the body of the with statement as stage `name`."""
+        if not self.enabled:
+            yield
+            return
+        nmodules = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings.append((name, elapsed, len(sys.modules) - nmodules))
+
+    def report(self, file=None):
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        width = max(len(name) for name, *_ in self.timings)
+        print(f"{'stage':<{width}}  {'seconds':>8}  {'modules':>7}", file=file)
+        for name, elapsed, nmodules in self.timings:
+            print(f"{name:<{width}}  {elapsed:8.3f}  {nmodules:7d}", file=file)
+        total = time.perf_counter() - self.t0
+        print(f"{'total':<{width}}  {total:8.3f}  {len(sys.modules):7d}", file=file)
+
+
+class ImportThread(QtCore.QThread):
+    """Import `modules` in the background, emitting `progress` with each name first."""
+
+    progress = QtCore.Signal(str)
+
+    def __init__(self, modules, profile):
+        super().__init__()
+        self.modules = modules
+        self.profile = profile
+
+    def run(self):
+        for name in self.modules:
+            self.progress.emit(name)
+            with self.profile.measure(f"import {name}"):
+                try:
+                    importlib.import_module(name)
+                except ImportError:
+                    # optional, or reported properly when imported for real
+                    pass
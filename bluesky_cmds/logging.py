@@ -8,12 +8,17 @@ __all__ = [
     "setLevel",
 ]
 
-from collections import defaultdict
+import atexit
+from collections import defaultdict, deque
+import datetime
 import itertools
 import logging
+import logging.handlers
+import queue
 
 from qtpy import QtCore, QtGui, QtWidgets
 from ._app import app
+from . import _log_archive
 from .project.colors import colors
 
 DEBUG = logging.DEBUG
@@ -30,26 +35,86 @@ logger_color_cycle = itertools.cycle(list(colors.values())[:10])
 # initialized.
 #
 class Signaller(QtCore.QObject):
-    signal = QtCore.Signal(str, logging.LogRecord)
+    signal = QtCore.Signal(list)
 
 
 class QtHandler(logging.Handler):
-    def __init__(self, slotfunc, *args, **kwargs):
+    """
+    Collect formatted records, sending them to `slotfunc` as a list of (message, record) pairs.
+
+    Records are sent in one signal per `flush`, or whenever `batch_size` records
+    have been collected, rather than one signal per record.
+    """
+
+    def __init__(self, slotfunc, *args, batch_size=1000, **kwargs):
         super().__init__(*args, **kwargs)
+        self.batch_size = batch_size
+        self._batch = []
         self.signaller = Signaller()
         self.signaller.signal.connect(slotfunc)
 
     def emit(self, record):
         s = self.format(record)
-        self.signaller.signal.emit(s, record)
+        self._batch.append((s, record))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self.signaller.signal.emit(batch)
+
+
+class BatchListener(logging.handlers.QueueListener):
+    """QueueListener which flushes its handlers whenever it has emptied the queue."""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records as they are, leaving all formatting to the listener thread.
+
+    The queue never leaves this process, so records need not be made picklable,
+    and the logging thread (usually the GUI thread) does no formatting.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class ConsoleFilter(logging.Filter):
+    """Reject records of the loggers in `names`, and of their children."""
+
+    def __init__(self):
+        super().__init__()
+        self.names = set()
+
+    def filter(self, record):
+        name = record.name
+        while name:
+            if name in self.names:
+                return False
+            name = name.rpartition(".")[0]
+        return True
 
 
 #
 # Implement a simple UI for this cookbook example. This contains:
 #
 # * A read-only text edit window which holds formatted log messages
+# * Level and logger filters
 # * A button to clear the log window
 #
+# Records are kept in a ring buffer of fixed capacity and appended to the text
+# edit in batches on a timer, so memory stays flat and chatty loggers do not
+# re-layout the document once per record.
+#
 # Adapted from https://docs.python.org/3/howto/logging-cookbook.html#a-qt-gui-for-logging
 #
 class LogWidget(QtWidgets.QWidget):
@@ -63,9 +128,14 @@ class LogWidget(QtWidgets.QWidget):
     }
     LOGGER_COLORS = defaultdict(lambda: next(logger_color_cycle))
 
-    def __init__(self, app):
+    def __init__(self, app, capacity=10000, interval=100):
         super().__init__()
         self.app = app
+        self.records = deque(maxlen=capacity)
+        self._pending = deque(maxlen=capacity)
+        self.level = logging.DEBUG
+        self.logger_name = None
+        self._logger_names = set()
         self.textedit = te = QtWidgets.QPlainTextEdit(self)
         # Set whatever the default monospace font is for the platform
         te.setStyleSheet(
@@ -75,29 +145,150 @@ class LogWidget(QtWidgets.QWidget):
         f.setStyleHint(f.Monospace)
         te.setFont(f)
         te.setReadOnly(True)
+        te.setMaximumBlockCount(capacity)
+        self.level_combo = QtWidgets.QComboBox(self)
+        for level in self.COLORS:
+            self.level_combo.addItem(logging.getLevelName(level), level)
+        self.logger_combo = QtWidgets.QComboBox(self)
+        self.logger_combo.addItem("all loggers", None)
         PB = QtWidgets.QPushButton
         self.clear_button = PB("Clear log window", self)
+        self.search_button = PB("Search archive", self)
+        self.search_button.setEnabled(False)
+        self.archive_search = None
 
         # Lay out all the widgets
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(te)
-        layout.addWidget(self.clear_button)
+        filters = QtWidgets.QHBoxLayout()
+        filters.addWidget(self.level_combo)
+        filters.addWidget(self.logger_combo)
+        layout.addLayout(filters)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.clear_button)
+        buttons.addWidget(self.search_button)
+        layout.addLayout(buttons)
 
         # Connect the non-worker slots and signals
         self.clear_button.clicked.connect(self.clear_display)
+        self.search_button.clicked.connect(self.show_archive_search)
+        self.level_combo.currentIndexChanged.connect(self.on_filter_changed)
+        self.logger_combo.currentIndexChanged.connect(self.on_filter_changed)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
 
     # The functions below update the UI and run in the main thread because
     # that's where the slots are set up
 
-    def update_status(self, status, record):
+    def add_records(self, records):
+        self.records.extend(records)
+        self._pending.extend(records)
+        for _, record in records:
+            if record.name not in self._logger_names:
+                self._logger_names.add(record.name)
+                self.logger_combo.addItem(record.name, record.name)
+
+    def accepts(self, record):
+        if record.levelno < self.level:
+            return False
+        return self.logger_name is None or record.name == self.logger_name
+
+    def to_html(self, status, record):
         level_color = self.COLORS.get(record.levelno, "white")
         logger_color = self.LOGGER_COLORS[record.name]
-        s = f'<pre><font color="{level_color}">{record.levelname:10}</font><font color="{logger_color}">{record.name}:  </font>{status}</pre>'
-        self.textedit.appendHtml(s)
+        return f'<pre><font color="{level_color}">{record.levelname:10}</font><font color="{logger_color}">{record.name}:  </font>{status}</pre>'
+
+    def flush(self):
+        """Append records which arrived since the last flush, in one batch."""
+        if not self._pending:
+            return
+        html = [self.to_html(*entry) for entry in self._pending if self.accepts(entry[1])]
+        self._pending.clear()
+        if html:
+            self.textedit.appendHtml("".join(html))
+
+    def on_filter_changed(self):
+        self.level = self.level_combo.currentData()
+        self.logger_name = self.logger_combo.currentData()
+        # redraw from the retained records
+        self.textedit.clear()
+        self._pending.clear()
+        self._pending.extend(self.records)
+        self.flush()
 
     def clear_display(self):
+        self.records.clear()
+        self._pending.clear()
         self.textedit.clear()
 
+    def show_archive_search(self):
+        if self.archive_search is None:
+            self.archive_search = ArchiveSearch(archive.directory, self)
+        self.archive_search.show()
+        self.archive_search.raise_()
+
+
+class ArchiveSearch(QtWidgets.QDialog):
+    """Window listing archived records by time range, level and logger."""
+
+    max_results = 10000
+
+    def __init__(self, directory, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.setWindowTitle("Search log archive")
+        self.resize(900, 600)
+        now = QtCore.QDateTime.currentDateTime()
+        self.start = QtWidgets.QDateTimeEdit(now.addSecs(-3600), self)
+        self.stop = QtWidgets.QDateTimeEdit(now, self)
+        for edit in (self.start, self.stop):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.level_combo = QtWidgets.QComboBox(self)
+        for level in LogWidget.COLORS:
+            self.level_combo.addItem(logging.getLevelName(level), level)
+        self.logger_edit = QtWidgets.QLineEdit(self)
+        self.logger_edit.setPlaceholderText("all loggers")
+        self.search_button = QtWidgets.QPushButton("Search", self)
+        self.search_button.clicked.connect(self.search)
+        self.results = QtWidgets.QPlainTextEdit(self)
+        self.results.setReadOnly(True)
+        self.results.setFont(parent.textedit.font() if parent else self.results.font())
+        self.results.setStyleSheet(
+            f"QPlainTextEdit{{background-color: {colors['background']}; color: {colors['text_light']};}}"
+        )
+        controls = QtWidgets.QHBoxLayout()
+        for label, widget in (
+            ("from", self.start),
+            ("to", self.stop),
+            ("level", self.level_combo),
+            ("logger", self.logger_edit),
+        ):
+            controls.addWidget(QtWidgets.QLabel(label, self))
+            controls.addWidget(widget)
+        controls.addWidget(self.search_button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.results)
+
+    def search(self):
+        records = _log_archive.search(
+            self.directory,
+            start=self.start.dateTime().toMSecsSinceEpoch() / 1000,
+            stop=self.stop.dateTime().toMSecsSinceEpoch() / 1000,
+            level=self.level_combo.currentData(),
+            logger=self.logger_edit.text().strip() or None,
+        )
+        lines = []
+        for record in itertools.islice(records, self.max_results + 1):
+            time = datetime.datetime.fromtimestamp(record["time"]).isoformat(" ", "milliseconds")
+            lines.append(f"{time}  {record['level']:10}{record['logger']}:  {record['message']}")
+        if len(lines) > self.max_results:
+            lines[-1] = f"... more than {self.max_results} records, narrow the search"
+        self.results.setPlainText("\n".join(lines))
+
 
 log_widget = LogWidget(app)
 
@@ -110,17 +301,44 @@ formatter = logging.Formatter(
 _loggers = []
 _default_level = logging.INFO
 
+# loggers only enqueue records, which are formatted and handled by one listener thread
+_queue = queue.SimpleQueue()
+_console_filter = ConsoleFilter()
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(formatter)
+_console_handler.addFilter(_console_filter)
+_listener = BatchListener(_queue, _console_handler, QtHandler(log_widget.add_records))
+_listener.start()
+archive = None
+
+
+@atexit.register
+def _stop_listener():
+    _listener.stop()
+    if archive is not None:
+        archive.close()
+
+
+def start_archive(directory, **kwargs):
+    """
+    Also write all records to a `_log_archive.LogArchive` in `directory`.
+
+    Keyword arguments are passed to `LogArchive`. Records are written by the
+    logging listener thread, and can then be searched from the log tab.
+    """
+    global archive
+    archive = _log_archive.LogArchive(directory, **kwargs)
+    _listener.handlers += (archive,)
+    log_widget.search_button.setEnabled(True)
+
 
 def getLogger(name=None, *, console=True):
     """Wrapper of `logging.getLogger` which sets the default formatter."""
     logger = logging.getLogger(name)
     if not logger.hasHandlers():
-        if console:
-            ch = logging.StreamHandler()
-            ch.setFormatter(formatter)
-            logger.addHandler(ch)
-        ch = QtHandler(log_widget.update_status)
-        logger.addHandler(ch)
+        if not console:
+            _console_filter.names.add(logger.name)
+        logger.addHandler(RecordQueueHandler(_queue))
         logger.setLevel(_default_level)
         _loggers.append(logger)
     return logger
@@ -427,6 +427,21 @@ class TableWidget(QtWidgets.QTableWidget):
         self.setStyleSheet(StyleSheet)
 
 
+class TableView(QtWidgets.QTableView):
+    def __init__(self):
+        QtWidgets.QTableView.__init__(self)
+        StyleSheet = "QTableView::item{padding: 0px}"
+        StyleSheet += "QHeaderView::section{background: background_color; color:white; font: bold 14px}".replace(
+            "background_color", colors["background"]
+        )
+        StyleSheet += (
+            "QTableView{background-color: custom_color; color: text_color; font: 14px}".replace(
+                "custom_color", colors["background"]
+            ).replace("text_color", colors["text_light"])
+        )
+        self.setStyleSheet(StyleSheet)
+
+
 class TabWidget(QtWidgets.QTabWidget):
     def __init__(self):
         QtWidgets.QTabWidget.__init__(self)
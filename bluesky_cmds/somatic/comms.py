@@ -1,63 +1,68 @@
-import re
-
 from qtpy.QtCore import QThread
 from bluesky_queueserver_api.zmq import REManagerAPI
 
 from ..__main__ import config
 from .. import logging
-
-# Variable name changed for configuring addresses
-try:
-    RM = REManagerAPI(
-        zmq_control_addr=config.get("bluesky", {}).get("re-manager"),
-        zmq_info_addr=config.get("bluesky", {}).get("re-info"),
-    )
-except TypeError:
-    RM = REManagerAPI(
-        zmq_server_address=config.get("bluesky", {}).get("re-manager"),
-        zmq_subscribe_addr=config.get("bluesky", {}).get("re-info"),
-    )
-
-RM.user = "bluesky-cmds"
-RM.user_group = "admin"
-
-RM.console_monitor.enable()
+from .._console import ConsoleParser
+
+
+def connect():
+    """New RE Manager API, with its own sockets."""
+    # Variable name changed for configuring addresses
+    try:
+        api = REManagerAPI(
+            zmq_control_addr=config.get("bluesky", {}).get("re-manager"),
+            zmq_info_addr=config.get("bluesky", {}).get("re-info"),
+        )
+    except TypeError:
+        api = REManagerAPI(
+            zmq_server_address=config.get("bluesky", {}).get("re-manager"),
+            zmq_subscribe_addr=config.get("bluesky", {}).get("re-info"),
+        )
+    api.user = "bluesky-cmds"
+    api.user_group = "admin"
+    return api
+
+
+RM = connect()
+# pause, resume, stop and abort, which must never wait behind other requests
+RM_control = connect()
+# latency pings, which must never delay a control command either
+RM_ping = connect()
 
 root_logger = logging.getLogger("qserver", console=False)
 
 
 class LogThread(QThread):
-    levels = {
-        "D": logging.DEBUG,
-        "I": logging.INFO,
-        "W": logging.WARNING,
-        "E": logging.ERROR,
-        "C": logging.CRITICAL,
-    }
+    batch_size = 1000
 
     def run(self):
-        pattern = re.compile(r"^\[(.) .* .* (.*)\](.*)$")
-
+        parser = ConsoleParser(root_logger)
         while True:
+            for msg in self.next_messages():
+                parser.handle(msg)
+
+    def next_messages(self):
+        """Wait for the next console message, then also take any already waiting."""
+        try:
+            msgs = [RM.console_monitor.next_msg(timeout=99999)["msg"]]
+        except RM.RequestTimeoutError:
+            return []
+        while len(msgs) < self.batch_size:
             try:
-                msg = RM.console_monitor.next_msg(timeout=99999)["msg"]
-                match = pattern.match(msg)
-                levelno = logging.INFO
-                logger = root_logger
-
-                if match:
-                    level, logger_name, msg = match.groups()
-                    logger = root_logger.getChild(logger_name.split(".")[-1])
-                    levelno = self.levels.get(level, logging.INFO)
-
-                if msg.strip():
-                    logger.log(levelno, msg.strip())
+                msgs.append(RM.console_monitor.next_msg(timeout=None)["msg"])
             except RM.RequestTimeoutError:
-                pass
+                break
+        return msgs
 
 
 log_thread = LogThread()
 
-log_thread.start()
+
+def start_log_thread():
+    """Start forwarding RE Manager console output to the log."""
+    RM.console_monitor.enable()
+    log_thread.start()
+
 
 # TODO close down log thread correctly
@@ -0,0 +1,196 @@
+"""Run RE Manager commands in a worker thread, in the order they were submitted."""
+
+__all__ = ["Command", "CommandExecutor", "executor", "control", "pinger"]
+
+import concurrent.futures
+import queue
+import threading
+import time
+
+from qtpy import QtCore
+
+from ..__main__ import config
+from .. import logging
+import bluesky_cmds.project.project_globals as g
+
+logger = logging.getLogger("commands")
+
+
+class Command:
+    """
+    A call submitted to a `CommandExecutor`.
+
+    `state` is one of "pending", "running", "done", "failed", "timed out" or
+    "cancelled". `future` holds the result, or the exception raised.
+    """
+
+    def __init__(self, description, func, args, kwargs, timeout, callback):
+        self.description = description
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.callback = callback
+        self.state = "pending"
+        self.future = concurrent.futures.Future()
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    @property
+    def round_trip(self):
+        """Seconds from starting the call until it returned, or None."""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def __repr__(self):
+        return f"<Command {self.description!r} {self.state}>"
+
+
+class CommandExecutor(QtCore.QObject):
+    """
+    Worker thread running submitted commands one at a time, in order.
+
+    Commands which take longer than their timeout are abandoned: their future
+    raises TimeoutError and the next command is started. Commands which have
+    not started can be cancelled.
+
+    `changed` is emitted, on the GUI thread, whenever a command is submitted
+    or changes state. Callbacks are also called on the GUI thread, with the
+    finished command.
+
+    Parameters
+    ----------
+    timeout : float (optional)
+        Default seconds to wait for each command. Default is 10.
+    name : str (optional)
+        Name of the worker thread. Default is "commands".
+    """
+
+    changed = QtCore.Signal(object)
+    _finished = QtCore.Signal(object)
+
+    def __init__(self, timeout=10, name="commands"):
+        super().__init__()
+        self.timeout = timeout
+        self.commands = []  # submitted and not yet finished, oldest first
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._finished.connect(self._on_finished)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, description, func, *args, timeout=None, callback=None, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` in the worker thread.
+
+        Parameters
+        ----------
+        description : str
+            Shown for the command while it is pending, and in log messages.
+        func : callable
+            Usually a method of the RE Manager API.
+        timeout : float (optional)
+            Seconds to wait for the command. Default is the executor timeout.
+        callback : callable (optional)
+            Called with the command on the GUI thread when it is finished, for
+            any reason but cancellation.
+
+        Returns
+        -------
+        Command
+        """
+        command = Command(
+            description,
+            func,
+            args,
+            kwargs,
+            self.timeout if timeout is None else timeout,
+            callback,
+        )
+        self.commands.append(command)
+        self._queue.put(command)
+        self.changed.emit(command)
+        return command
+
+    def cancel(self, command):
+        """Cancel `command` if it has not started, returning True if it was cancelled."""
+        if command.state != "pending" or not command.future.cancel():
+            return False
+        command.state = "cancelled"
+        logger.info(f"cancelled {command.description}")
+        self.commands.remove(command)
+        self.changed.emit(command)
+        return True
+
+    def pending(self):
+        return [command for command in self.commands if command.state == "pending"]
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            if command is None:
+                return
+            if not command.future.set_running_or_notify_cancel():
+                continue
+            command.state = "running"
+            command.started = time.monotonic()
+            self.changed.emit(command)
+            # the call itself runs in its own thread, so that it can be abandoned
+            done = threading.Event()
+            call = threading.Thread(target=self._call, args=(command, done), daemon=True)
+            call.start()
+            if not done.wait(command.timeout):
+                with self._lock:
+                    if not command.future.done():
+                        command.state = "timed out"
+                        command.finished = time.monotonic()
+                        command.future.set_exception(
+                            TimeoutError(f"no reply within {command.timeout} s")
+                        )
+            self._finished.emit(command)
+
+    def _call(self, command, done):
+        try:
+            result = command.func(*command.args, **command.kwargs)
+        except Exception as e:
+            state, outcome = "failed", e
+        else:
+            state, outcome = "done", result
+        finished = time.monotonic()
+        with self._lock:
+            if command.future.done():
+                logger.warning(f"{command.description} finished after it timed out")
+                return
+            command.state = state
+            command.finished = finished
+            if state == "failed":
+                command.future.set_exception(outcome)
+            else:
+                command.future.set_result(outcome)
+        done.set()
+
+    def _on_finished(self, command):
+        if command in self.commands:
+            self.commands.remove(command)
+        if command.state != "done":
+            logger.error(f"{command.description} {command.state}: {command.future.exception()}")
+        self.changed.emit(command)
+        if command.callback is not None:
+            command.callback(command)
+
+    def stop(self):
+        for command in self.pending():
+            self.cancel(command)
+        self._queue.put(None)
+        self._thread.join(1)
+
+
+executor = CommandExecutor(config.get("queue", {}).get("command-timeout", 10))
+g.shutdown.add_method(executor.stop)
+# priority lane for interrupting the run engine, used with its own connection
+control = CommandExecutor(config.get("queue", {}).get("control-timeout", 2), name="control")
+g.shutdown.add_method(control.stop)
+pinger = CommandExecutor(config.get("queue", {}).get("control-timeout", 2), name="ping")
+g.shutdown.add_method(pinger.stop)
@@ -0,0 +1,119 @@
+"""Persistent, pipelined connection to bluesky-hwproxy."""
+
+__all__ = ["HwproxyClient", "client"]
+
+import json
+import threading
+
+import zmq
+
+from ..__main__ import config
+from .. import logging
+import bluesky_cmds.project.project_globals as g
+
+logger = logging.getLogger("hwproxy")
+
+
+class HwproxyClient:
+    """
+    One DEALER socket to the hwproxy server, kept open between requests.
+
+    `request_many` sends every request before reading any reply, so a batch
+    costs one round trip rather than one per request. The server answers in
+    order. ZMQ heartbeats detect a dead connection, which is then reconnected
+    automatically. If a reply does not arrive in time the socket is replaced,
+    so that a late reply is never taken as the answer to a later request.
+
+    Parameters
+    ----------
+    address : str (optional)
+        Address of the hwproxy server. Default is "tcp://localhost:60620".
+    timeout : float (optional)
+        Seconds to wait for each reply. Default is 2.
+    heartbeat : float (optional)
+        Seconds between heartbeats. Default is 5.
+    """
+
+    def __init__(self, address="tcp://localhost:60620", timeout=2, heartbeat=5):
+        self.address = address
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.healthy = True
+        self._context = zmq.Context.instance()
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        socket = self._context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.setsockopt(zmq.HEARTBEAT_IVL, int(self.heartbeat * 1000))
+        socket.setsockopt(zmq.HEARTBEAT_TIMEOUT, int(2 * self.heartbeat * 1000))
+        socket.connect(self.address)
+        self._socket = socket
+
+    def _reset(self):
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
+
+    def request(self, method, params=None):
+        """Single request, returning ``(msg, err)`` as `zmq_single_request` does."""
+        return self.request_many([(method, params)])[0]
+
+    def request_many(self, requests):
+        """
+        Send `requests`, then wait for their replies.
+
+        Parameters
+        ----------
+        requests : list of (str, dict)
+            Method names and their parameters.
+
+        Returns
+        -------
+        list of tuple
+            ``(msg, err)`` for each request, in order. `msg` is None if the
+            request failed, and `err` then describes why.
+        """
+        if not requests:
+            return []
+        results = []
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+            try:
+                for method, params in requests:
+                    payload = json.dumps({"method": method, "params": params or {}})
+                    # empty delimiter frame, as a REQ socket would send
+                    self._socket.send_multipart([b"", payload.encode()])
+                for _ in requests:
+                    if not self._socket.poll(int(self.timeout * 1000)):
+                        raise TimeoutError(f"no reply from hwproxy within {self.timeout} s")
+                    frames = self._socket.recv_multipart()
+                    try:
+                        results.append((json.loads(frames[-1]), ""))
+                    except ValueError as e:
+                        results.append((None, f"invalid reply from hwproxy: {e}"))
+            except (zmq.ZMQError, TimeoutError) as e:
+                # outstanding replies must not be read by the next request
+                self._reset()
+                if self.healthy:
+                    logger.warning(f"hwproxy at {self.address}: {e}")
+                self.healthy = False
+                results.extend([(None, str(e))] * (len(requests) - len(results)))
+                return results
+        if not self.healthy:
+            logger.info(f"hwproxy at {self.address} is responding again")
+        self.healthy = True
+        return results
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+
+client = HwproxyClient(
+    config.get("hwproxy", {}).get("address", "tcp://localhost:60620"),
+    config.get("hwproxy", {}).get("timeout", 2),
+)
+g.shutdown.add_method(client.close)
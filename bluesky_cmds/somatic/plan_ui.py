@@ -1,13 +1,14 @@
-from collections import defaultdict
 import itertools
 import json
+import threading
+import time
 
 import toolz
 import numpy as np
 from qtpy import QtWidgets
 from .comms import RM
 from .signals import plans_allowed_updated, devices_allowed_updated
-from bluesky_hwproxy import zmq_single_request as hwproxy_request
+from .hwproxy import client as hwproxy
 
 import WrightTools as wt
 from bluesky_cmds.project import widgets as pw
@@ -27,31 +28,82 @@ def get_all_components(k, v):
     return out
 
 
+class DescribeCache:
+    """
+    In-memory cache of hwproxy ``describe`` responses, keyed by base device name.
+
+    Parameters
+    ----------
+    ttl : float (optional)
+        Seconds after which a description is requested again. Default is 0,
+        which keeps descriptions until the cache is cleared.
+    """
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _fresh(self, device):
+        if device not in self._cache:
+            return False
+        return not self.ttl or time.monotonic() - self._cache[device][0] < self.ttl
+
+    @staticmethod
+    def _describe(msg):
+        if msg is None:
+            return None
+        return msg.get("return", {})
+
+    def _store(self, device, describe):
+        # failed requests are not cached, so that they are retried
+        if describe is not None:
+            with self._lock:
+                self._cache[device] = (time.monotonic(), describe)
+
+    def get(self, device):
+        """Describe dictionary of base `device`, requested from hwproxy if not cached."""
+        with self._lock:
+            if self._fresh(device):
+                return self._cache[device][1]
+        msg, err = hwproxy.request("describe", {"device": device})
+        describe = self._describe(msg)
+        self._store(device, describe)
+        return describe or {}
+
+    def prefetch(self, devices):
+        """Request all uncached `devices` at once, in one round trip."""
+        with self._lock:
+            missing = [device for device in devices if not self._fresh(device)]
+        if not missing:
+            return
+        replies = hwproxy.request_many([("describe", {"device": device}) for device in missing])
+        for device, (msg, err) in zip(missing, replies):
+            self._store(device, self._describe(msg))
+
+
+describe_cache = DescribeCache(config.get("hwproxy", {}).get("describe-ttl", 0))
+
+
+def describe(device):
+    """Describe dictionary of `device`, which may be a dotted component name."""
+    base_name = device.split(".")[0]
+    key_name = device.replace(".", "_")
+    return describe_cache.get(base_name).get(key_name, {})
+
+
 def get_units(device):
-    if "." in device:
-        base_name = device.split(".")[0]
-        key_name = device.replace(".", "_")
-    else:
-        base_name = key_name = device
-    return (
-        hwproxy_request("describe", {"device": base_name})[0]
-        .get("return", {})
-        .get(key_name, {})
-        .get("units", None)
-    )
+    return describe(device).get("units", None)
 
 
 def get_limits(device):
-    if "." in device:
-        base_name = device.split(".")[0]
-        key_name = device.replace(".", "_")
-    else:
-        base_name = key_name = device
-    describe = (
-        hwproxy_request("describe", {"device": base_name})[0].get("return", {}).get(key_name, {})
-    )
-    low = describe.get("lower_ctrl_limit", -np.inf)
-    hi = describe.get("upper_ctrl_limit", np.inf)
+    describe_dict = describe(device)
+    low = describe_dict.get("lower_ctrl_limit", -np.inf)
+    hi = describe_dict.get("upper_ctrl_limit", np.inf)
     return (low, hi)
 
 
@@ -60,10 +112,12 @@ devices_all_json = {}
 devices_movable = []
 devices_not_movable = []
 devices_with_deps = []
+plans_allowed = {}
 
 
 def update_devices():
     global devices_all, devices_all_json, devices_movable, devices_not_movable, devices_with_deps
+    had_components = bool(devices_with_deps)
     devices_all_json = RM.devices_allowed()["devices_allowed"]
     devices_all = {}
 
@@ -73,7 +127,20 @@ def update_devices():
     devices_movable = list(filter(lambda x: devices_all[x]["is_movable"], devices_all))
     devices_not_movable = list(filter(lambda x: not devices_all[x]["is_movable"], devices_all))
     devices_with_deps = list(filter(lambda x: "components" in devices_all[x], devices_all))
-    update_plan_ui()
+    # devices_allowed_uid changed, so descriptions may have too
+    describe_cache.clear()
+    describe_cache.prefetch(devices_all_json)
+    plan_ui_lookup.update_devices(components_changed=bool(devices_with_deps) != had_components)
+
+
+def update_plans():
+    global plans_allowed
+    new = RM.plans_allowed()["plans_allowed"]
+    for name, plan in plans_allowed.items():
+        if new.get(name) != plan:
+            # parameters of the plan changed, its form is rebuilt when next looked up
+            plan_ui_lookup.discard(name)
+    plans_allowed = new
 
 
 class PlanUI:
@@ -93,6 +160,11 @@ class PlanUI:
         for x in self.items:
             layout.addWidget(x.frame)
 
+    def update_devices(self):
+        for item in self.items:
+            if hasattr(item, "update_devices"):
+                item.update_devices()
+
     @property
     def args(self):
         return list(itertools.chain(*[x.args for x in self.items]))
@@ -331,11 +403,30 @@ class EnumWidget(SingleWidget):
 class DeviceListWidget:
     def __init__(self):
         self.nargs = 1
-        self.inputs = {k: pc.Bool(True) for k in devices_not_movable}
-        self.frame = pw.InputTable()
-        self.frame.add("Devices", None)
-        for k, v in self.inputs.items():
-            self.frame.add(k, v)
+        self.inputs = {}
+        self.rows = {}
+        self.frame = QtWidgets.QWidget()
+        self.frame.setLayout(QtWidgets.QVBoxLayout())
+        self.frame.layout().setContentsMargins(0, 0, 0, 0)
+        heading = pw.InputTable()
+        heading.add("Devices", None)
+        self.frame.layout().addWidget(heading)
+        self.update_devices()
+
+    def update_devices(self):
+        # only add and remove the checkboxes of devices which changed
+        for device in list(self.inputs):
+            if device not in devices_not_movable:
+                del self.inputs[device]
+                row = self.rows.pop(device)
+                self.frame.layout().removeWidget(row)
+                row.deleteLater()
+        for i, device in enumerate(devices_not_movable):
+            if device not in self.inputs:
+                self.inputs[device] = pc.Bool(True)
+                self.rows[device] = pw.InputTable()
+                self.rows[device].add(device, self.inputs[device])
+                self.frame.layout().insertWidget(i + 1, self.rows[device])
 
     @property
     def kwargs(self):
@@ -383,6 +474,9 @@ class ConstantWidget:
     def add_constant(self, hardware=None, units="ps", terms=None):
         # TODO better default
         if not hardware:
+            if not devices_movable:
+                # no devices yet, the form is rebuilt once they are known
+                return
             hardware = devices_movable[0]
         if terms is None:
             terms = [[1, "d1"]]
@@ -397,6 +491,10 @@ class ConstantWidget:
         self.constants = self.constants[:-1]
         self.constants_container_widget.layout().removeWidget(const)
 
+    def update_devices(self):
+        for const in self.constants:
+            const.update_devices()
+
     @property
     def args(self):
         return []
@@ -459,6 +557,10 @@ class Constant(pw.InputTable):
                 coeffs[k.name] = float(v)
         return [(v, k) for k, v in coeffs.items()]
 
+    def update_devices(self):
+        self.hardware.set_allowed_values(devices_movable)
+        self.on_hardware_updated()
+
     def on_hardware_updated(self):
         hw_name = self.hardware.read()
         native = get_units(hw_name)
@@ -501,6 +603,10 @@ class GenericScanArgsWidget:
         self.axes = self.axes[:-1]
         self.axis_container_widget.layout().removeWidget(ax)
 
+    def update_devices(self):
+        for axis in self.axes:
+            axis.update_devices()
+
     @property
     def args(self):
         return list(itertools.chain(*[a.args for a in self.axes]))
@@ -542,6 +648,10 @@ class MvAxis(pw.InputTable):
             self.position.read(self.native),
         ]
 
+    def update_devices(self):
+        self.hardware.set_allowed_values(devices_movable)
+        self.set_unit()
+
     def update_hardware(self):
         self.set_unit()
         self.position.write(0.0)
@@ -559,6 +669,8 @@ class MvArgsWidget(GenericScanArgsWidget):
 
     def add_axis(self, hardware=None, position=0):
         if not hardware:
+            if not devices_movable:
+                return
             hardware = devices_movable[0]
         axis = MvAxis(hardware, position)
         self.axes.append(axis)
@@ -597,13 +709,13 @@ class GridscanAxis(pw.InputTable):
             units,
         ]
 
+    def update_devices(self):
+        self.hardware.set_allowed_values(devices_movable)
+        self.on_hardware_updated()
+
     def on_hardware_updated(self):
         hw_name = self.hardware.read()
-        base_name = hw_name.split(".")[0]
-        key_name = hw_name.replace(".", "_")
-        native = hwproxy_request("describe", {"device": base_name})[0]["return"][key_name].get(
-            "units", None
-        )
+        native = get_units(hw_name)
         units_list = [
             i for i in (native,) + wt.units.get_valid_conversions(native) if i != "mm_delay"
         ]
@@ -616,6 +728,8 @@ class GridscanArgsWidget(GenericScanArgsWidget):
 
     def add_axis(self, hardware=None, start=0, stop=1, npts=11, units="ps"):
         if not hardware:
+            if not devices_movable:
+                return
             hardware = devices_movable[0]
         axis = GridscanAxis(hardware, start, stop, npts, units)
         self.axes.append(axis)
@@ -651,6 +765,10 @@ class ScanAxis(pw.InputTable):
             units,
         ]
 
+    def update_devices(self):
+        self.hardware.set_allowed_values(devices_movable)
+        self.on_hardware_updated()
+
     def on_hardware_updated(self):
         hw_name = self.hardware.read()
         native = get_units(hw_name)
@@ -666,6 +784,8 @@ class ScanArgsWidget(GenericScanArgsWidget):
 
     def add_axis(self, hardware=None, start=0, stop=1, units="ps"):
         if not hardware:
+            if not devices_movable:
+                return
             hardware = devices_movable[0]
         axis = ScanAxis(hardware, start, stop, units)
         self.axes.append(axis)
@@ -699,6 +819,10 @@ class ListAxis(pw.InputTable):
             units,
         ]
 
+    def update_devices(self):
+        self.hardware.set_allowed_values(devices_movable)
+        self.on_hardware_updated()
+
     def on_hardware_updated(self):
         hw_name = self.hardware.read()
         native = get_units(hw_name)
@@ -714,22 +838,28 @@ class ListscanArgsWidget(GenericScanArgsWidget):
 
     def add_axis(self, hardware=None, list=[], units="ps"):
         if not hardware:
+            if not devices_movable:
+                return
             hardware = devices_movable[0]
         axis = ListAxis(hardware, list, units)
         self.axes.append(axis)
         self.axis_container_widget.layout().addWidget(axis)
 
 
+def _opa_options():
+    return {
+        x: x
+        for x in devices_with_deps
+        if len(devices_all_json.get(x, {}).get("components", {})) > 1
+    }
+
+
 class OpaSelectorWidget(EnumWidget):
     def __init__(self, name="opa"):
-        super().__init__(
-            name,
-            options={
-                x: x
-                for x in devices_with_deps
-                if len(devices_all_json.get(x, {}).get("components", {})) > 1
-            },
-        )
+        super().__init__(name, options=_opa_options())
+
+    def update_devices(self):
+        self.options = _opa_options()
 
 
 class OpaMotorSelectorWidget(EnumWidget):
@@ -742,6 +872,9 @@ class OpaMotorSelectorWidget(EnumWidget):
         self.opa_selector.input.updated.connect(self.on_opa_selected)
         # TODO mutual exclusion
 
+    def update_devices(self):
+        self.on_opa_selected()
+
     def on_opa_selected(self):
         motors = {x: x for x in devices_all_json[self.opa_selector.args[0]]["components"]}
         if not motors:
@@ -777,6 +910,9 @@ class OpaMotorAxis(pw.InputTable):
             "npts": int(self.npts.read()),
         }
 
+    def update_devices(self):
+        self.on_opa_updated()
+
     def on_opa_updated(self):
         self.motor.set_allowed_values(
             devices_all_json[self.opa_selector.args[0]]["components"].keys()
@@ -812,6 +948,14 @@ class OpaMotorFullWidget(GenericScanArgsWidget):
                 self.add_axis(motor=mot, **params)
 
 
+def _spectrometer_devices():
+    return [
+        dev
+        for dev in devices_all_json
+        if dev not in devices_with_deps and wt.units.is_valid_conversion(get_units(dev), "nm")
+    ]
+
+
 class SpectrometerWidget(pw.InputTable):
     def __init__(self, name="spectrometer", include_center=True):
         super().__init__()
@@ -819,11 +963,7 @@ class SpectrometerWidget(pw.InputTable):
         self.name = name
         self.frame = self
         self.add("Spectrometer", None)
-        spec_devices = []
-        for dev in devices_all_json:
-            if dev not in devices_with_deps and wt.units.is_valid_conversion(get_units(dev), "nm"):
-                spec_devices.append(dev)
-        self.device = pc.Combo(["None"] + spec_devices)
+        self.device = pc.Combo(["None"] + _spectrometer_devices())
         self.add("Device", self.device)
         self.method = pc.Combo(["none", "static", "zero", "track", "scan"])
         self.add("Method", self.method)
@@ -891,6 +1031,9 @@ class SpectrometerWidget(pw.InputTable):
     def args(self):
         return []
 
+    def update_devices(self):
+        self.device.set_allowed_values(["None"] + _spectrometer_devices())
+
     def on_device_selected(self):
         if self.device.read() == "None":
             for var in ("center", "width", "units", "npts"):
@@ -904,155 +1047,145 @@ class SpectrometerWidget(pw.InputTable):
             getattr(self, var).set_disabled(not var in self.used[method])
 
 
-plan_ui_lookup = defaultdict(PlanUI)
-
-
-def update_plan_ui():
-    plan_ui_lookup["sleep"] = PlanUI(
-        [
-            FloatWidget("time", "time", 1.0),
-        ]
-    )
-    plan_ui_lookup["mv"] = PlanUI(
-        [
-            MvArgsWidget(),
-        ]
-    )
-    plan_ui_lookup["grid_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            GridscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["rel_grid_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            GridscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ScanArgsWidget(),
-            IntWidget("Npts", "num", 11),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["rel_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ScanArgsWidget(),
-            IntWidget("Npts", "num", 11),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["list_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ListscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["rel_list_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ListscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["list_grid_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ListscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["rel_list_grid_scan_wp"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            ListscanArgsWidget(),
-            ConstantWidget(),
-        ]
-    )
-    plan_ui_lookup["count"] = PlanUI(
-        [
-            MetadataWidget(),
-            DeviceListWidget(),
-            IntWidget("Npts", "num", 1),
-            FloatWidget("Delay", "delay", 0),
-        ]
-    )
-
-    if devices_with_deps:
-        plan_ui_lookup["run_tune_test"] = PlanUI(
-            [
-                MetadataWidget(),
-                DeviceListWidget(),
-                OpaSelectorWidget(),
-                SpectrometerWidget(include_center=False),
-            ]
-        )
-        opa = OpaSelectorWidget()
-        plan_ui_lookup["run_setpoint"] = PlanUI(
-            [
-                MetadataWidget(),
-                DeviceListWidget(),
-                opa,
-                OpaMotorSelectorWidget(opa_selector=opa),
-                FloatWidget("Width", "width", 1),
-                IntWidget("Npts", "npts", 11),
-                SpectrometerWidget(include_center=False),
-            ]
-        )
-        opa = OpaSelectorWidget()
-        plan_ui_lookup["run_intensity"] = PlanUI(
-            [
-                MetadataWidget(),
-                DeviceListWidget(),
-                opa,
-                OpaMotorSelectorWidget(opa_selector=opa),
-                FloatWidget("Width", "width", 1),
-                IntWidget("Npts", "npts", 11),
-                SpectrometerWidget(include_center=False),
-            ]
-        )
-        opa = OpaSelectorWidget()
-        plan_ui_lookup["run_holistic"] = PlanUI(
-            [
-                MetadataWidget(),
-                DeviceListWidget(),
-                opa,
-                OpaMotorSelectorWidget(opa_selector=opa),
-                OpaMotorSelectorWidget(opa_selector=opa),
-                FloatWidget("Width", "width", 1),
-                IntWidget("Npts", "npts", 11),
-                SpectrometerWidget(include_center=False),
-            ]
-        )
-        opa = OpaSelectorWidget()
-        plan_ui_lookup["motortune"] = PlanUI(
-            [
-                MetadataWidget(),
-                DeviceListWidget(),
-                opa,
-                BoolWidget("Use Tune Points", "use_tune_points"),
-                OpaMotorFullWidget(opa_selector=opa),
-                SpectrometerWidget(),
-            ]
-        )
-
-    # TODO: Reload current UI state
+class PlanUIRegistry:
+    """
+    PlanUI forms keyed by plan name, built on first use.
 
+    Factories return the list of widgets of a plan's form. The form is built
+    the first time the plan is looked up and cached until `clear` is called.
+    Plans without a factory get the generic `PlanUI` form, as do plans which
+    require devices with components (OPAs) while there are none. Until the
+    devices are first known every plan gets a generic placeholder form, which
+    is discarded by `update_devices` so that the real form is built instead.
+    """
 
-plans_allowed_updated.connect(update_plan_ui)
+    def __init__(self):
+        self.factories = {}
+        self._built = {}
+        self._placeholders = set()
+        self.devices_known = False
+
+    def register(self, name, factory, requires_components=False):
+        self.factories[name] = (factory, requires_components)
+
+    def __getitem__(self, name):
+        if name not in self._built:
+            factory, requires_components = self.factories.get(name, (None, False))
+            if factory is not None and not self.devices_known:
+                self._built[name] = PlanUI()
+                self._placeholders.add(name)
+            elif factory is None or (requires_components and not devices_with_deps):
+                self._built[name] = PlanUI()
+            else:
+                self._built[name] = PlanUI(factory())
+        return self._built[name]
+
+    def __contains__(self, name):
+        return name in self._built
+
+    def built(self, name):
+        """The form of `name` if it has been built, otherwise None."""
+        return self._built.get(name)
+
+    def discard(self, name):
+        self._built.pop(name, None)
+        self._placeholders.discard(name)
+
+    def update_devices(self, components_changed=False):
+        """
+        Patch built forms in place for the current devices.
+
+        If devices with components (OPAs) appeared or disappeared, forms of
+        plans requiring them are discarded instead, to be rebuilt when next
+        looked up. So are placeholders built before the devices were known.
+        """
+        self.devices_known = True
+        for name in self._placeholders:
+            del self._built[name]
+        self._placeholders.clear()
+        for name, form in list(self._built.items()):
+            if components_changed and self.factories.get(name, (None, False))[1]:
+                del self._built[name]
+            else:
+                form.update_devices()
+
+
+plan_ui_lookup = PlanUIRegistry()
+
+
+def _scan_items(args_widget, *extra):
+    return [MetadataWidget(), DeviceListWidget(), args_widget, *extra, ConstantWidget()]
+
+
+def _opa_motor_items(opa, nmotors):
+    motors = [OpaMotorSelectorWidget(opa_selector=opa) for _ in range(nmotors)]
+    return [
+        MetadataWidget(),
+        DeviceListWidget(),
+        opa,
+        *motors,
+        FloatWidget("Width", "width", 1),
+        IntWidget("Npts", "npts", 11),
+        SpectrometerWidget(include_center=False),
+    ]
+
+
+def _motortune_items():
+    opa = OpaSelectorWidget()
+    return [
+        MetadataWidget(),
+        DeviceListWidget(),
+        opa,
+        BoolWidget("Use Tune Points", "use_tune_points"),
+        OpaMotorFullWidget(opa_selector=opa),
+        SpectrometerWidget(),
+    ]
+
+
+plan_ui_lookup.register("sleep", lambda: [FloatWidget("time", "time", 1.0)])
+plan_ui_lookup.register("mv", lambda: [MvArgsWidget()])
+plan_ui_lookup.register("grid_scan_wp", lambda: _scan_items(GridscanArgsWidget()))
+plan_ui_lookup.register("rel_grid_scan_wp", lambda: _scan_items(GridscanArgsWidget()))
+plan_ui_lookup.register(
+    "scan_wp", lambda: _scan_items(ScanArgsWidget(), IntWidget("Npts", "num", 11))
+)
+plan_ui_lookup.register(
+    "rel_scan_wp", lambda: _scan_items(ScanArgsWidget(), IntWidget("Npts", "num", 11))
+)
+plan_ui_lookup.register("list_scan_wp", lambda: _scan_items(ListscanArgsWidget()))
+plan_ui_lookup.register("rel_list_scan_wp", lambda: _scan_items(ListscanArgsWidget()))
+plan_ui_lookup.register("list_grid_scan_wp", lambda: _scan_items(ListscanArgsWidget()))
+plan_ui_lookup.register("rel_list_grid_scan_wp", lambda: _scan_items(ListscanArgsWidget()))
+plan_ui_lookup.register(
+    "count",
+    lambda: [
+        MetadataWidget(),
+        DeviceListWidget(),
+        IntWidget("Npts", "num", 1),
+        FloatWidget("Delay", "delay", 0),
+    ],
+)
+plan_ui_lookup.register(
+    "run_tune_test",
+    lambda: [
+        MetadataWidget(),
+        DeviceListWidget(),
+        OpaSelectorWidget(),
+        SpectrometerWidget(include_center=False),
+    ],
+    requires_components=True,
+)
+plan_ui_lookup.register(
+    "run_setpoint", lambda: _opa_motor_items(OpaSelectorWidget(), 1), requires_components=True
+)
+plan_ui_lookup.register(
+    "run_intensity", lambda: _opa_motor_items(OpaSelectorWidget(), 1), requires_components=True
+)
+plan_ui_lookup.register(
+    "run_holistic", lambda: _opa_motor_items(OpaSelectorWidget(), 2), requires_components=True
+)
+plan_ui_lookup.register("motortune", _motortune_items, requires_components=True)
+
+
+plans_allowed_updated.connect(update_plans)
 devices_allowed_updated.connect(update_devices)
@@ -4,37 +4,176 @@ import pathlib
 import appdirs  # type: ignore
 
 from qtpy.QtGui import QDesktopServices
-from qtpy.QtCore import QUrl
+from qtpy.QtCore import QFileSystemWatcher, QObject, QUrl, Signal
+
+from .. import logging
+
+logger = logging.getLogger("presets")
 
 preset_dir = pathlib.Path(appdirs.user_data_dir("bluesky-cmds", "bluesky-cmds")) / "presets"
 preset_dir.mkdir(parents=True, exist_ok=True)
 
 
+class PresetStore(QObject):
+    """
+    Parsed preset files of `directory`, kept up to date with a file system watcher.
+
+    Each file is parsed once, and again only when its modification time or
+    size changes. Lines which are not valid JSON are kept as `errors` of the
+    preset. `changed` is emitted whenever presets are added, removed or
+    modified.
+    """
+
+    changed = Signal()
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = pathlib.Path(directory)
+        self._presets = {}  # name: (mtime, size, items, errors)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(str(self.directory))
+        self.watcher.directoryChanged.connect(self.refresh)
+        self.watcher.fileChanged.connect(self.refresh)
+        self.refresh()
+
+    def path(self, name):
+        return self.directory / f"{name}.json"
+
+    def refresh(self, *args):
+        paths = {path.stem: path for path in self.directory.glob("*.json")}
+        changed = False
+        for name in list(self._presets):
+            if name not in paths:
+                del self._presets[name]
+                changed = True
+        for name, path in paths.items():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            cached = self._presets.get(name)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                continue
+            self._presets[name] = (stat.st_mtime_ns, stat.st_size, *self._parse(path))
+            changed = True
+        # files replaced by an editor drop out of the watcher, add them again
+        watched = set(self.watcher.files())
+        wanted = {str(path) for path in paths.values()}
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.watcher.addPaths(list(wanted - watched))
+        if changed:
+            self.changed.emit()
+
+    def _parse(self, path):
+        """Items of the preset file at `path`, and (line number, message) of lines which are not."""
+        items = []
+        errors = []
+        with path.open("rt") as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError as e:
+                    logger.warning(f"{path.name} line {number} is not valid: {e}")
+                    errors.append((number, str(e)))
+        return items, errors
+
+    def names(self):
+        return sorted(self._presets)
+
+    def items(self, name):
+        if name not in self._presets:
+            raise KeyError(f"No such preset: {name}")
+        return self._presets[name][2]
+
+    def errors(self, name):
+        """(line number, message) of each line of preset `name` which could not be parsed."""
+        if name not in self._presets:
+            raise KeyError(f"No such preset: {name}")
+        return self._presets[name][3]
+
+    def estimate(self, name, durations):
+        """
+        Number of items of preset `name`, their estimated duration, and how many had none.
+
+        `durations` maps plan names to a typical duration in seconds.
+        """
+        items = self.items(name)
+        known = [durations[item.get("name")] for item in items if item.get("name") in durations]
+        return len(items), sum(known), len(items) - len(known)
+
+    def append(self, name, item=None):
+        path = self.path(name)
+        with path.open("at") as f:
+            if item is not None:
+                item = {
+                    k: v
+                    for k, v in item.items()
+                    if k in ("item_type", "name", "args", "kwargs", "meta")
+                }
+                json.dump(item, f)
+                f.write("\n")
+        # update the cache in place, rather than parsing the file again
+        stat = path.stat()
+        _, _, items, errors = self._presets.get(name, (None, None, [], []))
+        if item is not None:
+            items.append(item)
+        self._presets[name] = (stat.st_mtime_ns, stat.st_size, items, errors)
+        if str(path) not in self.watcher.files():
+            self.watcher.addPath(str(path))
+        self.changed.emit()
+
+
+store = PresetStore(preset_dir)
+
+
 def get_preset_names():
-    return [x.stem for x in preset_dir.glob("*.json")]
+    return store.names()
 
 
 def get_preset_items(preset):
-    preset_file = preset_dir / f"{preset}.json"
-    if not preset_file.exists():
-        raise KeyError(r"No such preset: {preset}")
-    with preset_file.open("rt") as f:
-        for line in f:
-            if line:
-                yield json.loads(line)
+    yield from store.items(preset)
+
+
+def validate_item(item, plans_allowed):
+    """
+    Reason the queue server would reject `item`, or None if it looks acceptable.
+
+    Only the plan name and argument names are checked against `plans_allowed`
+    (the ``plans_allowed`` dictionary of the RE Manager). If that is empty, as
+    before the first status update, every plan is accepted.
+    """
+    item_type = item.get("item_type")
+    if item_type == "instruction":
+        return None
+    if item_type != "plan":
+        return f"unknown item type {item_type!r}"
+    if not plans_allowed:
+        return None
+    plan = plans_allowed.get(item.get("name"))
+    if plan is None:
+        return f"plan {item.get('name')!r} is not allowed"
+    if "parameters" not in plan:
+        return None
+    kinds = {p["name"]: p.get("kind", {}).get("name") for p in plan["parameters"]}
+    if "VAR_KEYWORD" not in kinds.values():
+        unexpected = sorted(set(item.get("kwargs", {})) - set(kinds))
+        if unexpected:
+            return f"unexpected arguments {unexpected} for plan {item['name']!r}"
+    if "VAR_POSITIONAL" not in kinds.values():
+        npositional = sum(
+            kind in ("POSITIONAL_ONLY", "POSITIONAL_OR_KEYWORD") for kind in kinds.values()
+        )
+        if len(item.get("args", [])) > npositional:
+            return f"too many positional arguments for plan {item['name']!r}"
+    return None
 
 
 def append_preset_item(preset, item=None):
-    preset_file = preset_dir / f"{preset}.json"
-    with preset_file.open("at") as f:
-        if item is not None:
-            item = {
-                k: v
-                for k, v in item.items()
-                if k in ("item_type", "name", "args", "kwargs", "meta")
-            }
-            json.dump(item, f)
-            f.write("\n")
+    store.append(preset, item)
 
 
 def open_preset_file(preset):
@@ -1,12 +1,15 @@
 ### import ####################################################################
 
 import collections
+import datetime
 import functools
 import pprint
+import statistics
 
 from qtpy import QtCore, QtGui, QtWidgets
 
-from .comms import RM
+from .comms import RM, RM_control, RM_ping
+from bluesky_cmds.__main__ import config
 from bluesky_queueserver_api import BInst, BPlan
 
 import bluesky_cmds.project.project_globals as g
@@ -17,7 +20,12 @@ from bluesky_cmds.project.colors import colors
 import bluesky_cmds.somatic as somatic
 
 from . import plan_ui
+from .executor import executor, control, pinger
 from . import presets
+from . import queue_model
+from .. import logging
+
+logger = logging.getLogger("queue")
 
 ### GUI #######################################################################
 
@@ -32,6 +40,7 @@ class GUI(QtCore.QObject):
         parent_widget.setLayout(QtWidgets.QHBoxLayout())
         parent_widget.layout().setContentsMargins(0, 10, 0, 0)
         self.layout = parent_widget.layout()
+        self.plan_durations = {}
         self.create_frame()
         self.interrupt_choice_window = pw.ChoiceWindow(
             "QUEUE INTERRUPTED", button_labels=["RESUME", "STOP AFTER PLAN", "SKIP", "STOP NOW"]
@@ -40,40 +49,34 @@ class GUI(QtCore.QObject):
         self.env_close_choice_window = pw.ChoiceWindow(
             "ENVIRONMENT CLOSE", button_labels=["no", "YES"]
         )
+        self.preset_failed_window = pw.ChoiceWindow("PRESET NOT APPENDED", button_labels=["ok"])
+        self.preset_unknown_window = pw.ChoiceWindow("PRESET NOT CONFIRMED", button_labels=["ok"])
         # queue
         self.queue = []
         self.history = []
         self.running = {}
+        history_config = config.get("queue", {})
+        self.history_unbounded = history_config.get("unbounded-history", False)
+        self.history_cache = queue_model.HistoryCache(
+            history_config.get("history-page-size", 100),
+            history_config.get("history-cache-pages", 20),
+        )
+        self.history_pages = 1
         self.update_ui()
         somatic.signals.queue_updated.connect(self.update_queue)
         somatic.signals.history_updated.connect(self.update_history)
-        somatic.signals.plans_allowed_updated.connect(self.rebuild_plan_ui)
-        somatic.signals.devices_allowed_updated.connect(self.rebuild_plan_ui)
-
-    def add_button_to_table(self, i, j, text, color):
-        button = pw.SetButton(text, color=color)
-        button.setProperty("TableRowIndex", i)
-        self.table.setCellWidget(i, j, button)
-        return button
-
-    def add_index_to_table(self, table_index, queue_index, max_value):
-        # for some reason, my lambda function does not work when called outside
-        # of a dedicated method - Blaise 2016-09-14
-        index = QtWidgets.QSpinBox()
-        StyleSheet = f"QSpinBox{{color: {colors['text_light']}; font: 14px;}}"
-        StyleSheet += f"QScrollArea, QWidget{{background: {colors['background']};  border-color: black; border-radius: 0px;}}"
-        StyleSheet += f"QWidget:disabled{{color: {colors['text_disabled']}; font: 14px; border: 0px solid black; border-radius: 0px;}}"
-        index.setStyleSheet(StyleSheet)
-        # index.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons)
-        index.setMaximum(max_value)
-        index.setAlignment(QtCore.Qt.AlignCenter)
-        index.setValue(queue_index)
-        index.setProperty("TableRowIndex", table_index)
-        index.editingFinished.connect(
-            lambda: self.on_index_changed(queue_index, int(index.value()))
-        )
-        self.table.setCellWidget(table_index, 0, index)
-        return index
+        somatic.signals.plans_allowed_updated.connect(self.update_plans)
+        presets.store.changed.connect(self.update_presets)
+        somatic.signals.devices_allowed_updated.connect(self.update_plan_widgets)
+        executor.changed.connect(self.update_commands)
+        control.changed.connect(self.on_control_changed)
+        pinger.changed.connect(self.on_control_changed)
+        # keep the control latency current while connected
+        self.control_ping_timer = QtCore.QTimer()
+        self.control_ping_timer.timeout.connect(self.on_control_ping)
+        ping_interval = config.get("queue", {}).get("control-ping-interval", 5)
+        if ping_interval:
+            self.control_ping_timer.start(int(ping_interval * 1000))
 
     def create_frame(self):
         # queue display -------------------------------------------------------
@@ -82,8 +85,24 @@ class GUI(QtCore.QObject):
         display_layout = display_container_widget.layout()
         display_layout.setContentsMargins(0, 0, 0, 0)
         # table
-        self.table = pw.TableWidget()
+        self.model = queue_model.QueueModel()
+        self.model.index_changed.connect(self.on_index_changed)
+        self.table = pw.TableView()
+        self.table.setModel(self.model)
         self.table.verticalHeader().hide()
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(30)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.AllEditTriggers)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.table.setItemDelegateForColumn(queue_model.INDEX, queue_model.IndexDelegate(self))
+        self.remove_delegate = queue_model.ButtonDelegate("stop", self)
+        self.remove_delegate.clicked.connect(self.on_remove_row)
+        self.table.setItemDelegateForColumn(queue_model.REMOVE, self.remove_delegate)
+        self.load_delegate = queue_model.ButtonDelegate("go", self)
+        self.load_delegate.clicked.connect(lambda row: self.on_load_item(self.model.item(row)))
+        self.table.setItemDelegateForColumn(queue_model.LOAD, self.load_delegate)
+        self.table.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.on_table_context_menu)
         self.table_cols = collections.OrderedDict()
         self.table_cols["Index"] = 50
         self.table_cols["Type"] = 150
@@ -91,14 +110,9 @@ class GUI(QtCore.QObject):
         self.table_cols["Description"] = 200  # expanding
         self.table_cols["Remove"] = 75
         self.table_cols["Load"] = 75
-        for i in range(len(self.table_cols.keys())):
-            self.table.insertColumn(i)
-        labels = list(self.table_cols.keys())
-        labels[-1] = ""
-        labels[-2] = ""
-        self.table.setHorizontalHeaderLabels(labels)
         self.table.horizontalHeader().setSectionResizeMode(3, QtWidgets.QHeaderView.Stretch)
         self.table.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
         for i, width in enumerate(self.table_cols.values()):
             self.table.setColumnWidth(i, width)
         # controls ------------------------------------------------------------
@@ -126,6 +140,10 @@ class GUI(QtCore.QObject):
         settings_layout.addWidget(self.interrupt)
         somatic.signals.queue_relinquishing_control.connect(self.interrupt.hide)
         somatic.signals.queue_taking_control.connect(self.interrupt.show)
+        input_table = pw.InputTable()
+        self.control_latency = pc.String(display=True)
+        input_table.add("Control Latency", self.control_latency)
+        settings_layout.addWidget(input_table)
         line = pw.Line("H")
         settings_layout.addWidget(line)
         self.env_close = pw.SetButton("CLOSE ENVIRONMENT", "stop")
@@ -139,6 +157,21 @@ class GUI(QtCore.QObject):
         self.clear_history = pw.SetButton("CLEAR HISTORY", "stop")
         self.clear_history.clicked.connect(self.on_clear_history_clicked)
         settings_layout.addWidget(self.clear_history)
+        # pending commands
+        input_table = pw.InputTable()
+        input_table.add("Pending Commands", None)
+        settings_layout.addWidget(input_table)
+        self.command_list = QtWidgets.QListWidget()
+        StyleSheet = f"QListWidget{{color: {colors['text_light']}; font: 14px; background: {colors['background']};}}"
+        self.command_list.setStyleSheet(StyleSheet)
+        self.command_list.setMaximumHeight(100)
+        self.command_list.setToolTip("Double click a pending command to cancel it")
+        self.command_list.itemDoubleClicked.connect(self.on_command_double_clicked)
+        settings_layout.addWidget(self.command_list)
+        self.cancel_commands = pw.SetButton("CANCEL PENDING", "stop")
+        self.cancel_commands.clicked.connect(self.on_cancel_commands_clicked)
+        settings_layout.addWidget(self.cancel_commands)
+        self.update_commands()
         # horizontal line
         line = pw.Line("H")
         settings_layout.addWidget(line)
@@ -171,7 +204,9 @@ class GUI(QtCore.QObject):
 
     def create_instruction_frame(self):
         button = pw.SetButton("Append Queue Stop")
-        button.clicked.connect(lambda: RM.item_add(BInst("queue_stop")))
+        button.clicked.connect(
+            lambda: executor.submit("append queue stop", RM.item_add, BInst("queue_stop"))
+        )
         return button
 
     def update_presets(self):
@@ -181,6 +216,34 @@ class GUI(QtCore.QObject):
             vals = ["No Presets"]
             self.append_preset_button.setDisabled(True)
         self.preset.set_allowed_values(vals)
+        self.update_preset_summary()
+
+    def update_preset_summary(self):
+        preset = self.preset.read()
+        if preset not in presets.get_preset_names():
+            self.preset_count.write("")
+            self.preset_duration.write("")
+            return
+        count, seconds, unknown = presets.store.estimate(preset, self.plan_durations)
+        errors = presets.store.errors(preset)
+        if errors:
+            self.preset_count.write(f"{count} + {len(errors)} invalid lines")
+        else:
+            self.preset_count.write(str(count))
+        duration = str(datetime.timedelta(seconds=round(seconds)))
+        if unknown:
+            duration += f" + {unknown} unknown"
+        self.preset_duration.write(duration)
+
+    def update_plan_durations(self):
+        # median duration of completed plans in the history
+        durations = collections.defaultdict(list)
+        for item in self.history:
+            result = item.get("result", {})
+            if result.get("exit_status") == "completed" and "time_start" in result:
+                durations[item["name"]].append(result["time_stop"] - result["time_start"])
+        self.plan_durations = {k: statistics.median(v) for k, v in durations.items()}
+        self.update_preset_summary()
 
     def create_preset_frame(self):
         frame = QtWidgets.QWidget()
@@ -192,7 +255,12 @@ class GUI(QtCore.QObject):
         if not vals:
             vals = ["No Presets"]
         self.preset = pc.Combo(allowed_values=vals)
+        self.preset.updated.connect(self.update_preset_summary)
         input_table.add("Preset", self.preset)
+        self.preset_count = pc.String(display=True)
+        input_table.add("Items", self.preset_count)
+        self.preset_duration = pc.String(display=True)
+        input_table.add("Est. Duration", self.preset_duration)
         self.append_preset_button = pw.SetButton("Append Preset Plans")
         self.append_preset_button.clicked.connect(self.on_append_preset)
         layout.addWidget(input_table)
@@ -200,13 +268,92 @@ class GUI(QtCore.QObject):
         self.edit_preset_button.clicked.connect(self.on_edit_preset)
         layout.addWidget(self.edit_preset_button)
         layout.addWidget(self.append_preset_button)
+        self.update_preset_summary()
         return frame
 
+    def show_message(self, text):
+        self.message_widget.setText(text)
+        # paint now, the caller is about to block the event loop
+        self.message_widget.repaint()
+
     def on_append_preset(self):
         preset = self.preset.read()
-        for item in presets.get_preset_items(preset):
+        items = []
+        # a line which can not be parsed fails the whole preset, like a rejected item
+        errors = presets.store.errors(preset)
+        failures = [(None, {}, f"line {number}: {error}") for number, error in errors]
+        for i, item in enumerate(presets.get_preset_items(preset)):
             # TODO add metadata here
-            RM.item_add(item)
+            error = presets.validate_item(item, plan_ui.plans_allowed)
+            if error:
+                failures.append((i, item, error))
+            items.append(item)
+            if i % 100 == 0:
+                self.show_message(f"checking preset {preset}: {i + 1} items")
+        if failures or not items:
+            self.on_preset_appended(preset, len(items) + len(errors), failures)
+            return
+        # one atomic request: either every item is added or none are
+        self.show_message(f"appending {len(items)} items of preset {preset}")
+        executor.submit(
+            f"append preset {preset}",
+            RM.item_add_batch,
+            items,
+            callback=functools.partial(self.on_preset_batch_finished, preset, items),
+        )
+
+    def on_preset_batch_finished(self, preset, items, command):
+        try:
+            response = command.future.result()
+        except RM.RequestFailedError as e:
+            response = e.response
+        except Exception as e:
+            # timed out or lost the connection, the batch may have been applied anyway
+            self.report_preset_unknown(preset, len(items), e)
+            return
+        results = response.get("results", [])
+        failures = [
+            (i, item, result.get("msg", ""))
+            for i, (item, result) in enumerate(zip(items, results))
+            if not result.get("success", False)
+        ]
+        if not response.get("success", False) and not failures:
+            failures = [(None, {}, response.get("msg", "request failed"))]
+        self.on_preset_appended(preset, len(items), failures)
+
+    def on_preset_appended(self, preset, nitems, failures):
+        if failures:
+            self.show_message(f"preset {preset} not appended")
+            self.report_preset_failures(preset, nitems, failures)
+        else:
+            self.show_message(f"appended {nitems} items of preset {preset}")
+
+    def report_preset_failures(self, preset, nitems, failures):
+        lines = []
+        for i, item, error in failures:
+            if i is None:
+                lines.append(error)
+            else:
+                lines.append(f"item {i + 1} ({item.get('name')}): {error}")
+            logger.error(f"preset {preset}: {lines[-1]}")
+        if len(lines) > 20:
+            lines = lines[:20] + [f"... and {len(lines) - 20} more, see the log"]
+        self.preset_failed_window.set_text(
+            f"{len(failures)} of {nitems} items of preset {preset} were rejected, "
+            "no items were appended."
+        )
+        self.preset_failed_window.set_informative_text("\n".join(lines))
+        self.preset_failed_window.show()
+
+    def report_preset_unknown(self, preset, nitems, error):
+        logger.error(f"preset {preset}: no confirmation from RE Manager: {error}")
+        self.show_message(f"preset {preset} may not have been appended")
+        self.preset_unknown_window.set_text(
+            f"The RE Manager did not confirm the {nitems} items of preset {preset}. "
+            "They may or may not have been appended, check the queue before appending again."
+        )
+        self.preset_unknown_window.set_informative_text(str(error))
+        self.preset_unknown_window.show()
 
     def on_edit_preset(self):
         preset = self.preset.read()
@@ -222,7 +369,6 @@ class GUI(QtCore.QObject):
 
         if ok:
             presets.append_preset_item(name, item)
-        self.update_presets()
 
     def create_plan_frame(self):
         frame = QtWidgets.QWidget()
@@ -239,31 +385,42 @@ class GUI(QtCore.QObject):
         self.plan_combo.updated.connect(self.on_plan_selected)
         input_table.add("Plan", self.plan_combo)
         layout.addWidget(input_table)
-        self.plan_widgets = {x: plan_ui.plan_ui_lookup[x] for x in allowed_values}
-        self.on_plan_selected()
-        for widget in self.plan_widgets.values():
-            layout.addWidget(widget.frame)
         append_button = pw.SetButton("APPEND TO QUEUE")
         append_button.clicked.connect(self.on_append_to_queue)
         layout.addWidget(append_button)
+        # plan forms are built and added when first selected
+        self.plan_layout = layout
+        self.plan_widgets = {}
+        self.on_plan_selected()
         return frame
 
-    def rebuild_plan_ui(self):
-        for frame in self.type_frames.values():
-            self.settings_layout.removeWidget(frame)
-            frame.hide()
-            frame.close()
-        self.type_frames["plan"] = self.create_plan_frame()
-        for frame in self.type_frames.values():
-            # TODO remove magic number
-            self.settings_layout.insertWidget(10, frame)
-            frame.hide()
-        self.on_load_item(self.get_plan().to_dict())
-        self.update_type()
+    def get_plan_widget(self, plan_name):
+        if plan_name not in self.plan_widgets:
+            widget = plan_ui.plan_ui_lookup[plan_name]
+            # above the append button
+            self.plan_layout.insertWidget(self.plan_layout.count() - 1, widget.frame)
+            self.plan_widgets[plan_name] = widget
+        return self.plan_widgets[plan_name]
+
+    def update_plans(self):
+        self.plan_combo.set_allowed_values(list(plan_ui.plans_allowed) or ["connecting..."])
+        self.update_plan_widgets()
+
+    def update_plan_widgets(self):
+        # forms discarded by plan_ui are rebuilt when next shown, the others keep their edits
+        for plan_name, widget in list(self.plan_widgets.items()):
+            if (
+                plan_name not in self.plan_combo.allowed_values
+                or plan_ui.plan_ui_lookup.built(plan_name) is not widget
+            ):
+                self.plan_layout.removeWidget(widget.frame)
+                widget.frame.setParent(None)
+                del self.plan_widgets[plan_name]
+        self.on_plan_selected()
 
     def get_plan(self):
         plan_name = self.plan_combo.read()
-        widget = self.plan_widgets[plan_name]
+        widget = self.get_plan_widget(plan_name)
         kwargs = widget.kwargs
         meta = kwargs.pop("md", {})
         plan = BPlan(plan_name, *widget.args, **kwargs)
@@ -272,44 +429,44 @@ class GUI(QtCore.QObject):
 
     def on_append_to_queue(self):
         plan = self.get_plan()
-        RM.item_add(plan)
+        executor.submit(f"append {plan.name}", RM.item_add, plan)
 
     def on_queue_start_clicked(self):
-        RM.queue_start()
+        executor.submit("start queue", RM.queue_start)
 
     def on_interrupt_clicked(self):
-        RM.re_pause("immediate")
+        control.submit("pause", RM_control.re_pause, "immediate")
         self.interrupt_choice_window.set_text("Please choose how to proceed.")
         index = self.interrupt_choice_window.show()
         if index == 0:  # RESUME
-            RM.re_resume()
+            control.submit("resume", RM_control.re_resume)
         elif index == 1:  # STOP AFTER PLAN
-            RM.re_resume()
-            RM.queue_stop()
+            control.submit("resume", RM_control.re_resume)
+            control.submit("stop queue", RM_control.queue_stop)
         elif index == 2:  # HALT
-            RM.re_stop()
+            control.submit("stop", RM_control.re_stop)
         elif index == 3:  # HALT
-            RM.re_abort()
+            control.submit("abort", RM_control.re_abort)
         # TODO Recover skip behavior... may require upstream change to be sane
 
     def on_clear_clicked(self):
         self.clear_choice_window.set_text("Do you want to clear the queue?")
         index = self.clear_choice_window.show()
         if index == 1:
-            RM.queue_clear()
+            executor.submit("clear queue", RM.queue_clear)
 
     def on_clear_history_clicked(self):
         self.clear_choice_window.set_text("Do you want to clear the history?")
         index = self.clear_choice_window.show()
         if index == 1:
-            RM.history_clear()
+            executor.submit("clear history", RM.history_clear)
 
     def on_env_close_clicked(self):
         self.env_close_choice_window.set_text("Do you wish to close the worker environment?")
-        if RM.status().get("manager_state") == "idle":
+        if somatic.signals.status.get("manager_state") == "idle":
             index = self.env_close_choice_window.show()
             if index == 1:
-                RM.environment_close()
+                executor.submit("close environment", RM.environment_close)
         else:
             input_dia = QtWidgets.QInputDialog()
             response, ok = input_dia.getText(
@@ -318,22 +475,65 @@ class GUI(QtCore.QObject):
                 "The queue is not idle, and so a graceful environment close is not possible.\nIf you would like to destroy the environment anyway, type 'destroy':\n",
             )
             if response.lower() == "destroy":
-                RM.environment_destroy()
+                executor.submit("destroy environment", RM.environment_destroy)
 
     def on_index_changed(self, row, new_index):
         item = self.queue[row]
-        RM.item_move(uid=item["item_uid"], pos_dest=new_index)
+        executor.submit(
+            f"move {item['name']} to {new_index}",
+            RM.item_move,
+            uid=item["item_uid"],
+            pos_dest=new_index,
+        )
+
+    def on_remove_row(self, row):
+        _, _, position = self.model.row_info(row)
+        if position is not None:
+            self.on_remove_item(position)
 
     def on_remove_item(self, row):
         item = self.queue[row]
-        RM.item_remove(uid=item["item_uid"])
+        executor.submit(f"remove {item['name']}", RM.item_remove, uid=item["item_uid"])
+
+    def update_commands(self, command=None):
+        self.command_list.clear()
+        for pending in executor.commands:
+            list_item = QtWidgets.QListWidgetItem(f"{pending.description} ({pending.state})")
+            list_item.setData(QtCore.Qt.UserRole, pending)
+            self.command_list.addItem(list_item)
+        self.cancel_commands.setDisabled(not executor.pending())
+        if command is not None and command.state in ("failed", "timed out"):
+            self.show_message(f"{command.description} {command.state}")
+
+    def on_control_ping(self):
+        # over its own connection, so a pause is never queued behind a ping
+        if somatic.signals.status.get("manager_state") and not pinger.commands:
+            pinger.submit("ping", RM_ping.ping)
+
+    def on_control_changed(self, command):
+        if command.state == "done":
+            self.control_latency.write(f"{command.round_trip * 1000:.0f} ms")
+            if command.description != "ping":
+                logger.info(f"{command.description} took {command.round_trip * 1000:.0f} ms")
+        elif command.state in ("failed", "timed out"):
+            self.control_latency.write(command.state)
+            if command.description != "ping":
+                self.show_message(f"{command.description} {command.state}")
+
+    def on_command_double_clicked(self, list_item):
+        executor.cancel(list_item.data(QtCore.Qt.UserRole))
+
+    def on_cancel_commands_clicked(self):
+        for command in executor.pending():
+            executor.cancel(command)
 
     def on_load_item(self, item):
         self.plan_combo.write(item["name"])
         kwargs = item.get("kwargs", {})
         kwargs["md"] = item.get("meta", {})
-        self.plan_widgets[item["name"]].args = item.get("args", [])
-        self.plan_widgets[item["name"]].kwargs = kwargs
+        widget = self.get_plan_widget(item["name"])
+        widget.args = item.get("args", [])
+        widget.kwargs = kwargs
 
     def update_type(self):
         for frame in self.type_frames.values():
@@ -343,105 +543,62 @@ class GUI(QtCore.QObject):
     def on_plan_selected(self):
         for frame in self.plan_widgets.values():
             frame.frame.hide()
-        self.plan_widgets[self.plan_combo.read()].frame.show()
+        self.get_plan_widget(self.plan_combo.read()).frame.show()
 
     def update_queue(self):
         queue_get = RM.queue_get()
         self.queue = queue_get.get("items", [])
         self.running = queue_get.get("running_item", {})
-        self.update_ui()
+        self.model.set_queue(self.queue, self.running)
 
     def update_history(self):
         history_get = RM.history_get()
-        self.history = history_get.get("items", [])
-        self.update_ui()
+        history = history_get.get("items", [])
+        if not self.history_unbounded:
+            # the server always sends the complete history, only hold the newest pages
+            history = self.history_cache.update(history, self.history_pages)
+        self.history = history
+        self.model.set_history(self.history)
+        self.update_plan_durations()
+
+    def on_table_scrolled(self, value):
+        # load the next older page of history when scrolled to the bottom
+        if self.history_unbounded or value < self.table.verticalScrollBar().maximum():
+            return
+        if len(self.history) >= self.history_cache.length:
+            return
+        self.history_pages += 1
+        history = self.history_cache.get(self.history_pages)
+        if history is None:
+            self.update_history()
+        else:
+            self.history = history
+            self.model.set_history(self.history)
+            self.update_plan_durations()
 
     def update_ui(self):
-        # clear table
-        for _ in range(self.table.rowCount()):
-            self.table.removeRow(0)
+        self.model.set_queue(self.queue, self.running)
+        self.model.set_history(self.history)
+
+    def on_table_context_menu(self, pos):
+        index = self.table.indexAt(pos)
+        if not index.isValid():
+            return
+        item = self.model.item(index.row())
 
-        def copy_info(_, info):
+        def copy_info(info):
             QtGui.QGuiApplication.clipboard().setText(info)
 
-        def add_item(item, status=None, queue_index=None, append=False):
-            table_index = self.table.rowCount() if append else 0
-            self.table.insertRow(table_index)
-            if queue_index is not None:
-                self.add_index_to_table(table_index, queue_index, len(self.queue) - 1)
-            # type
-            label = pw.Label(item["name"])
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setContentsMargins(3, 3, 3, 3)
-            self.table.setCellWidget(table_index, 1, label)
-            # status
-            label = pw.Label(status or item.get("result", {}).get("exit_status"))
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setContentsMargins(3, 3, 3, 3)
-            self.table.setCellWidget(table_index, 2, label)
-            # description
-            container = QtWidgets.QWidget()
-            label = pw.Label(repr(item.get("args", [])) + repr(item.get("kwargs", {})))
-            label.setContentsMargins(3, 3, 3, 3)
-            label.setToolTip(pprint.pformat(item))
-            label.setDisabled(True)
-            container.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
-            copyJsonAction = QtWidgets.QAction("Copy JSON", container)
-            copyJsonAction.triggered.connect(
-                functools.partial(copy_info, info=pprint.pformat(item))
+        menu = QtWidgets.QMenu(self.table)
+        menu.addAction("Copy JSON", functools.partial(copy_info, pprint.pformat(item)))
+        menu.addAction("Copy Item UID", functools.partial(copy_info, item["item_uid"]))
+        if "result" in item and item["result"]["run_uids"]:
+            # TODO: account for multiple runs, currently nothing we use actually does multiple runs
+            # So I'm ignoring the possibility (wasn't trivial to get it to work -- KFS 2022-06-16
+            menu.addAction(
+                "Copy Run UID", functools.partial(copy_info, item["result"]["run_uids"][0])
             )
-            container.addAction(copyJsonAction)
-            copyItemUidAction = QtWidgets.QAction("Copy Item UID", container)
-            copyItemUidAction.triggered.connect(
-                functools.partial(copy_info, info=item["item_uid"])
-            )
-            container.addAction(copyItemUidAction)
-            label.setParent(container)
-            self.table.setCellWidget(table_index, 3, container)
-
-            if "result" in item and item["result"]["run_uids"]:
-                # TODO: account for multiple runs, currently nothing we use actually does multiple runs
-                # So I'm ignoring the possibility (wasn't trivial to get it to work -- KFS 2022-06-16
-                copyRunIdAction = QtWidgets.QAction("Copy Run UID", container)
-                copyRunIdAction.triggered.connect(
-                    functools.partial(copy_info, info=item["result"]["run_uids"][0])
-                )
-                container.addAction(copyRunIdAction)
-
-            appendPresetAction = QtWidgets.QAction("Append to preset...", container)
-            appendPresetAction.triggered.connect(
-                functools.partial(self.show_preset_dialog, item=item)
-            )
-            container.addAction(appendPresetAction)
-
-            # remove
-            if status == "enqueued":
-                button = self.add_button_to_table(table_index, 4, "REMOVE", "stop")
-
-                def rem():
-                    self.on_remove_item(queue_index)
-
-                button.clicked.connect(rem)
-            if status in ("enqueued", "RUNNING"):
-                label.setDisabled(False)
-
-            def load():
-                self.on_load_item(item)
-
-            button = self.add_button_to_table(table_index, 5, "LOAD", "go")
-            button.clicked.connect(load)
-
-        # add elements from history
-        for i, item in enumerate(self.history):
-            if item == {}:
-                continue
-            add_item(item)
-
-        if self.running:
-            add_item(self.running, "RUNNING")
-
-        # add elements from queue
-        for i, item in enumerate(self.queue):
-            if item == {}:
-                continue
-            add_item(item, "enqueued", i)
+        menu.addAction(
+            "Append to preset...", functools.partial(self.show_preset_dialog, item=item)
+        )
+        menu.exec_(self.table.viewport().mapToGlobal(pos))
@@ -0,0 +1,281 @@
+"""Table model and delegates for the plan queue and history."""
+
+import collections
+import pprint
+
+from qtpy import QtCore, QtGui, QtWidgets
+
+from bluesky_cmds.project.colors import colors
+
+INDEX, TYPE, STATUS, DESCRIPTION, REMOVE, LOAD = range(6)
+
+
+class HistoryCache:
+    """
+    Bounded LRU cache of plan history pages.
+
+    Pages are counted from the oldest item, so that they stay valid while new
+    items are appended to the history.
+
+    Parameters
+    ----------
+    page_size : int
+        Number of items per page.
+    max_pages : int
+        Number of pages to show at most. One more page is retained, as the
+        newest `max_pages` worth of items usually span ``max_pages + 1`` pages.
+        Least recently used pages are evicted first.
+    """
+
+    def __init__(self, page_size, max_pages):
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.length = 0
+        self._pages = collections.OrderedDict()
+
+    def page_count(self):
+        return -(-self.length // self.page_size)
+
+    def _window(self, pages):
+        # the newest `pages` pages worth of items, and the cached pages holding them
+        start = max(0, self.length - pages * self.page_size)
+        return start, range(start // self.page_size, self.page_count())
+
+    def update(self, history, pages):
+        """
+        Take `history` as the complete history, returning its newest `pages`.
+
+        The newest `max_pages` pages worth of items are cached, so that older
+        pages can be shown later without fetching the history again.
+        """
+        if len(history) < self.length:
+            # history was cleared
+            self._pages.clear()
+        self.length = len(history)
+        start, window = self._window(pages)
+        first = max(0, self.page_count() - self.max_pages - 1)
+        # pages outside the window first, so that the window is the most recently used
+        cached = [page for page in range(first, self.page_count()) if page not in window]
+        for page in cached + list(window):
+            self._put(page, history[page * self.page_size : (page + 1) * self.page_size])
+        return history[start:]
+
+    def _put(self, page, items):
+        self._pages[page] = items
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.max_pages + 1:
+            self._pages.popitem(last=False)
+
+    def get(self, pages):
+        """Newest `pages` worth of items, oldest first, or None if not all are cached."""
+        start, window = self._window(pages)
+        if any(page not in self._pages for page in window):
+            return None
+        items = []
+        for page in window:
+            self._pages.move_to_end(page)
+            items.extend(self._pages[page])
+        return items[start - window.start * self.page_size :]
+
+
+class QueueModel(QtCore.QAbstractTableModel):
+    """
+    Plan queue, running item and plan history as one table.
+
+    Rows are ordered newest first: the queue (last item at the top), the
+    running item, then the history. Cells are only formatted when the view
+    asks for them, that is for visible rows.
+
+    New lists are reconciled against the current ones by ``item_uid``, so
+    only rows which were inserted, removed, moved or changed are touched.
+    """
+
+    headers = ["Index", "Type", "Status", "Description", "", ""]
+    index_changed = QtCore.Signal(int, int)
+
+    def __init__(self):
+        super().__init__()
+        # each section is kept in display order
+        self.queue_rows = []
+        self.running_rows = []
+        self.history_rows = []
+
+    def set_queue(self, queue, running):
+        self._reconcile("queue_rows", [item for item in reversed(queue) if item])
+        self._reconcile("running_rows", [running] if running else [])
+        if self.queue_rows:
+            # positions are counted from the bottom of the section, refresh them all
+            top = self.index(0, INDEX)
+            bottom = self.index(len(self.queue_rows) - 1, INDEX)
+            self.dataChanged.emit(top, bottom)
+
+    def set_history(self, history):
+        self._reconcile("history_rows", [item for item in reversed(history) if item])
+
+    def _offset(self, section):
+        if section == "queue_rows":
+            return 0
+        elif section == "running_rows":
+            return len(self.queue_rows)
+        return len(self.queue_rows) + len(self.running_rows)
+
+    def _reconcile(self, section, new):
+        rows = getattr(self, section)
+        offset = self._offset(section)
+        root = QtCore.QModelIndex()
+        new_uids = {item["item_uid"] for item in new}
+        # removals, in contiguous blocks from the bottom
+        i = len(rows) - 1
+        while i >= 0:
+            if rows[i]["item_uid"] in new_uids:
+                i -= 1
+                continue
+            j = i
+            while j > 0 and rows[j - 1]["item_uid"] not in new_uids:
+                j -= 1
+            self.beginRemoveRows(root, offset + j, offset + i)
+            del rows[j : i + 1]
+            self.endRemoveRows()
+            i = j - 1
+        # insertions, moves and changes, walking the new order
+        old_uids = {item["item_uid"] for item in rows}
+        for i, item in enumerate(new):
+            uid = item["item_uid"]
+            if uid not in old_uids:
+                self.beginInsertRows(root, offset + i, offset + i)
+                rows.insert(i, item)
+                self.endInsertRows()
+                continue
+            if rows[i]["item_uid"] != uid:
+                j = next(k for k in range(i + 1, len(rows)) if rows[k]["item_uid"] == uid)
+                self.beginMoveRows(root, offset + j, offset + j, root, offset + i)
+                rows.insert(i, rows.pop(j))
+                self.endMoveRows()
+            if rows[i] != item:
+                rows[i] = item
+                self.dataChanged.emit(
+                    self.index(offset + i, 0), self.index(offset + i, len(self.headers) - 1)
+                )
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.queue_rows) + len(self.running_rows) + len(self.history_rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def row_info(self, row):
+        """Item, status and queue position (None if not enqueued) of `row`."""
+        if row < len(self.queue_rows):
+            return self.queue_rows[row], "enqueued", len(self.queue_rows) - 1 - row
+        row -= len(self.queue_rows)
+        if row < len(self.running_rows):
+            return self.running_rows[row], "RUNNING", None
+        item = self.history_rows[row - len(self.running_rows)]
+        return item, item.get("result", {}).get("exit_status"), None
+
+    def item(self, row):
+        return self.row_info(row)[0]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item, status, position = self.row_info(index.row())
+        column = index.column()
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            if column == INDEX:
+                return position
+            elif column == TYPE:
+                return item["name"]
+            elif column == STATUS:
+                return status
+            elif column == DESCRIPTION:
+                return repr(item.get("args", [])) + repr(item.get("kwargs", {}))
+            elif column == REMOVE:
+                return "REMOVE" if status == "enqueued" else None
+            elif column == LOAD:
+                return "LOAD"
+        elif role == QtCore.Qt.ToolTipRole and column == DESCRIPTION:
+            return pprint.pformat(item)
+        elif role == QtCore.Qt.TextAlignmentRole and column != DESCRIPTION:
+            return QtCore.Qt.AlignCenter
+        elif role == QtCore.Qt.ForegroundRole:
+            if column == DESCRIPTION and status not in ("enqueued", "RUNNING"):
+                return QtGui.QColor(colors["text_disabled"])
+            return QtGui.QColor(colors["text_light"])
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() == INDEX and index.row() < len(self.queue_rows):
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.EditRole or index.column() != INDEX:
+            return False
+        _, _, position = self.row_info(index.row())
+        if position is None or int(value) == position:
+            return False
+        # the queue server owns the order, the table follows on the next queue update
+        self.index_changed.emit(position, int(value))
+        return True
+
+
+class IndexDelegate(QtWidgets.QStyledItemDelegate):
+    """Spinbox editor for the queue position of enqueued rows."""
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QSpinBox(parent)
+        StyleSheet = f"QSpinBox{{color: {colors['text_light']}; font: 14px;}}"
+        StyleSheet += f"QScrollArea, QWidget{{background: {colors['background']};  border-color: black; border-radius: 0px;}}"
+        StyleSheet += f"QWidget:disabled{{color: {colors['text_disabled']}; font: 14px; border: 0px solid black; border-radius: 0px;}}"
+        editor.setStyleSheet(StyleSheet)
+        editor.setMaximum(max(len(index.model().queue_rows) - 1, 0))
+        editor.setAlignment(QtCore.Qt.AlignCenter)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value(), QtCore.Qt.EditRole)
+
+
+class ButtonDelegate(QtWidgets.QStyledItemDelegate):
+    """Paint non-empty cells as a button, emitting `clicked` with the row when released."""
+
+    clicked = QtCore.Signal(int)
+
+    def __init__(self, color="go", parent=None):
+        super().__init__(parent)
+        self.color = QtGui.QColor(colors[color])
+
+    def paint(self, painter, option, index):
+        text = index.data()
+        if not text:
+            return
+        painter.save()
+        painter.fillRect(option.rect.adjusted(1, 1, -1, -1), self.color)
+        font = QtGui.QFont(option.font)
+        font.setBold(True)
+        font.setPixelSize(14)
+        painter.setFont(font)
+        painter.setPen(QtGui.QColor("black"))
+        painter.drawText(option.rect, QtCore.Qt.AlignCenter, text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonRelease and index.data():
+            self.clicked.emit(index.row())
+            return True
+        return False
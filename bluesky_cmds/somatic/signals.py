@@ -1,5 +1,70 @@
+import threading
+
 from qtpy import QtCore
 from .comms import RM
+from .. import logging
+import bluesky_cmds.project.project_globals as g
+
+logger = logging.getLogger("status")
+
+
+class StatusMonitor(QtCore.QThread):
+    """
+    Poll RE Manager status in a background thread.
+
+    Only the keys which changed since the previous poll are emitted through
+    `status_changed`. Polling is fast while the manager is busy, slow while it
+    is idle, and backs off exponentially while it can not be reached. On
+    disconnection ``{"manager_state": None}`` is emitted.
+    """
+
+    status_changed = QtCore.Signal(dict)
+
+    def __init__(self, busy_period=0.1, idle_period=0.5, max_backoff=10.0):
+        super().__init__()
+        self.busy_period = busy_period
+        self.idle_period = idle_period
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+
+    def run(self):
+        previous = {}
+        delay = 0
+        backoff = self.idle_period
+        while not self._stop.wait(delay):
+            try:
+                status = RM.status(reload=True)
+            except Exception as e:
+                if previous:
+                    logger.warning(f"lost connection to RE Manager: {e}")
+                    self.status_changed.emit({"manager_state": None})
+                previous = {}
+                delay, backoff = backoff, min(2 * backoff, self.max_backoff)
+                continue
+            backoff = self.idle_period
+            if not status:
+                delay = self.idle_period
+                continue
+            if (
+                not status.get("worker_environment_exists")
+                and status.get("manager_state") == "idle"
+            ):
+                try:
+                    RM.environment_open()
+                except Exception as e:
+                    logger.error(e)
+            diff = {k: v for k, v in status.items() if previous.get(k) != v}
+            if diff:
+                self.status_changed.emit(diff)
+            previous = status
+            if status.get("manager_state") == "idle":
+                delay = self.idle_period
+            else:
+                delay = self.busy_period
+
+    def stop(self):
+        self._stop.set()
+        self.wait()
 
 
 class SignalContainer(QtCore.QObject):
@@ -18,35 +83,45 @@ class SignalContainer(QtCore.QObject):
     def __init__(self):
         super().__init__()
         self.status = {}
-        self.heartbeat = QtCore.QTimer()
-        self.heartbeat.timeout.connect(self.process_status)
-        self.heartbeat.start(500)
-
-    def process_status(self):
-        status = RM.status()
-        if not status:
-            return
-        if not status.get("worker_environment_exists") and status.get("manager_state") == "idle":
-            RM.environment_open()
-        if self.status.get("devices_allowed_uid") != status.get("devices_allowed_uid"):
+        self.monitor = StatusMonitor()
+        self.monitor.status_changed.connect(self.process_status)
+        g.shutdown.add_method(self.monitor.stop)
+
+    def start_monitor(self):
+        """
+        Start polling RE Manager status.
+
+        The first poll emits the full status, so connect everything which
+        follows the queue, history, plans and devices first.
+        """
+        self.monitor.start()
+
+    def process_status(self, diff):
+        self.status.update(diff)
+        if "devices_allowed_uid" in diff:
             self.devices_allowed_updated.emit()
-        if self.status.get("manager_state") != status.get("manager_state"):
-            self.manager_state_updated.emit(status["manager_state"])
-            if status["manager_state"] == "idle":
-                self.queue_relinquishing_control.emit()
+        if "manager_state" in diff:
+            if diff["manager_state"] is None:
+                self.manager_state_updated.emit("disconnected")
             else:
-                self.queue_taking_control.emit()
-        if self.status.get("plan_history_uid") != status.get("plan_history_uid"):
+                self.manager_state_updated.emit(diff["manager_state"])
+                if diff["manager_state"] == "idle":
+                    self.queue_relinquishing_control.emit()
+                else:
+                    self.queue_taking_control.emit()
+        if "plan_history_uid" in diff:
             self.history_updated.emit()
-        if self.status.get("plan_queue_uid") != status.get("plan_queue_uid"):
+        if "plan_queue_uid" in diff:
             self.queue_updated.emit()
-        if self.status.get("plans_allowed_uid") != status.get("plans_allowed_uid"):
+        if "plans_allowed_uid" in diff:
             self.plans_allowed_updated.emit()
-        self.status = status
 
 
 _signal_container = SignalContainer()
 
+status = _signal_container.status
+start_monitor = _signal_container.start_monitor
+
 queue_updated = _signal_container.queue_updated
 history_updated = _signal_container.history_updated
 devices_allowed_updated = _signal_container.devices_allowed_updated
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("WrightTools")
+pytest.importorskip("qtpy")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from bluesky_cmds._event_store import EventStore
+
+
+def event(seq_num, **data):
+    return {"seq_num": seq_num, "time": float(seq_num), "data": data}
+
+
+def test_array_of_declared_shape():
+    store = EventStore({"spectrum": {"dtype": "array", "shape": [4]}}, capacity=10)
+    store.append(event(1, spectrum=[1, 2, 3, 4]))
+    assert store.view("spectrum").shape == (1, 4)
+    assert store.last("max(spectrum)") == 4
+
+
+def test_array_of_mismatched_shape():
+    store = EventStore({"spectrum": {"dtype": "array", "shape": [4]}}, capacity=10)
+    store.append(event(1, spectrum=[1, 2, 3, 4]))
+    store.append(event(2, spectrum=[1, 2, 3, 4, 5]))
+    store.append(event(3, spectrum=[1, 2]))
+    values = store.view("spectrum")
+    assert values.shape == (3,)
+    np.testing.assert_array_equal(values[0], [1, 2, 3, 4])
+    assert list(values[1]) == [1, 2, 3, 4, 5]
+    assert list(values[2]) == [1, 2]
+    np.testing.assert_array_equal(store.view("max(spectrum)"), [4, 5, 2])
+
+
+def test_scalar_of_mismatched_dtype():
+    store = EventStore({"value": {"dtype": "number"}}, capacity=10)
+    store.append(event(1, value=1.0))
+    store.append(event(2, value="high"))
+    assert list(store.view("value")) == [1.0, "high"]
+
+
+def test_grid_backfilled_and_released():
+    store = EventStore({"x": {"dtype": "number"}, "y": {"dtype": "number"}}, capacity=10)
+    for n in range(1, 8):
+        store.append(event(n, x=n, y=-n))
+    grid = store.grid("y", (2, 2, 3), max_bytes=0)
+    store.append(event(8, x=8, y=-8))
+    plane = grid.plane(7)
+    assert list(plane[~np.isnan(plane)]) == [-7, -8]
+    assert np.isnan(grid.plane(0)).sum() == 0
+    store.grid("x", (2, 2, 3))
+    assert list(store.grids) == ["x"]
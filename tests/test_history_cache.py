@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+pytest.importorskip("qtpy")
+pytest.importorskip("bluesky_queueserver_api")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from bluesky_cmds.somatic.queue_model import HistoryCache
+
+
+def test_aligned_history():
+    cache = HistoryCache(page_size=10, max_pages=3)
+    history = list(range(50))
+    assert cache.update(history, 1) == history[-10:]
+    assert cache.get(2) == history[-20:]
+    assert cache.get(3) == history[-30:]
+
+
+def test_unaligned_history():
+    cache = HistoryCache(page_size=10, max_pages=3)
+    history = list(range(55))
+    assert cache.update(history, 1) == history[-10:]
+    assert cache.get(2) == history[-20:]
+    # 30 items span 4 pages counted from the oldest item
+    assert cache.get(3) == history[-30:]
+    assert cache.get(4) is None
+
+
+def test_cleared_history():
+    cache = HistoryCache(page_size=10, max_pages=3)
+    cache.update(list(range(55)), 1)
+    assert cache.update(list(range(5)), 1) == list(range(5))
+    assert cache.get(1) == list(range(5))